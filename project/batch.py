@@ -0,0 +1,159 @@
+from sudoku import Sudoku
+from util import EMPTY_VALUE, grid_to_line
+from corpus import Corpus, EXTENSION, get_values
+from batch_propagation import propagate_batch
+from game import SOLVER_TYPES
+from itertools import islice
+import numpy as np
+import time
+import sys
+
+
+CHUNK_SIZE = 4096
+
+
+def print_explanation_and_terminate():
+    print("USAGE: <puzzles-path|-> solver=<" + "|".join(SOLVER_TYPES) + "> [solutions-path|-] "
+          "[propagation=<true|false|vectorized>]")
+    print("solves a file with one puzzle per line (81 characters for 9x9, 256 for 16x16; '-' for stdin) or a corpus "
+          "file (" + EXTENSION + ", see corpus.py) and writes one solution per line (stdout if no solutions-path or "
+          "'-'). unsolved puzzles are written back as they are")
+    print("with vectorized propagation the puzzles are propagated " + str(CHUNK_SIZE) + " at a time (see "
+          "batch_propagation.py), only the puzzles it doesn't solve go to the solver")
+    print("example: puzzles.txt dancing_links solutions.txt true")
+    exit(-1)
+
+
+def read_puzzles(puzzles_file):
+    """
+    yields the puzzles of the file one by one, without reading the whole file.
+    the puzzles of a corpus (see corpus.py) are yielded as grids
+    """
+    if isinstance(puzzles_file, Corpus):
+        yield from puzzles_file
+        return
+    for line in puzzles_file:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def open_puzzles(path):
+    """the puzzles file ('-' for stdin), or the corpus if path is a corpus file"""
+    if path == '-':
+        return sys.stdin
+    return Corpus(path) if path.endswith(EXTENSION) else open(path)
+
+
+def solve_puzzle(puzzle, solver_type, propagation=False, budget=None, cache=None):
+    """
+    solves a single puzzle (a line or a grid), returns the solution line and whether it was solved.
+    with a cache (see cache.py) the solutions of isomorphic puzzles are reused.
+    raises ValueError if the line is not a puzzle (see Sudoku.parse_puzzle)
+    """
+    solver = Sudoku(None, solver_type, puzzle=puzzle, trace=False, propagation=propagation,
+                    budget=budget).get_solver()
+    if cache is not None:
+        cache.solve(solver)
+    else:
+        solver.solve()
+    if solver.is_solved and Sudoku.is_complete(solver.grid):
+        return grid_to_line(solver.grid), True
+    return puzzle if isinstance(puzzle, str) else grid_to_line(puzzle), False
+
+
+def solve_or_report(puzzle, number, solver_type, propagation=False, cache=None):
+    """like solve_puzzle, but a line that is not a puzzle is reported (number is its place in the batch) as unsolved"""
+    try:
+        return solve_puzzle(puzzle, solver_type, propagation, cache=cache)
+    except ValueError as error:
+        print("puzzle", number, "is not a puzzle:", error, file=sys.stderr)
+        return puzzle, False
+
+
+def solve_batch(puzzles_file, solutions_file, solver_type, propagation=False, cache=None):
+    """
+    streams the puzzles from puzzles_file through the solver and writes the solutions line by line.
+    a line that is not a puzzle is reported and written back as unsolved, the batch goes on.
+    returns the number of puzzles, the number of solved puzzles and the total time
+    """
+    puzzles_count = 0
+    solved_count = 0
+    start = time.time()
+    for puzzle in read_puzzles(puzzles_file):
+        solution, is_solved = solve_or_report(puzzle, puzzles_count + 1, solver_type, propagation, cache)
+        solutions_file.write(solution + "\n")
+        puzzles_count += 1
+        solved_count += is_solved
+
+    return puzzles_count, solved_count, time.time() - start
+
+
+def solve_batch_vectorized(puzzles_file, solutions_file, solver_type, chunk_size=CHUNK_SIZE):
+    """
+    like solve_batch, but every chunk of puzzles is propagated together first (see propagate_batch), so the puzzles
+    that singles solve never get a Sudoku or a solver. the rest are solved one by one from their propagated grid,
+    puzzles with a contradiction are written back as unsolved without a search, and so are the puzzles the solver
+    doesn't solve (as they were read, not propagated).
+    a chunk with a line that is not a puzzle, or with puzzles of different sizes, is solved one puzzle at a time
+    """
+    puzzles_count = 0
+    solved_count = 0
+    start = time.time()
+    puzzles = read_puzzles(puzzles_file)
+    while True:
+        chunk = list(islice(puzzles, chunk_size))
+        if not chunk:
+            break
+        tiles_count = len(chunk[0]) if isinstance(chunk[0], str) else np.size(chunk[0])
+        try:
+            grids, contradictions = propagate_batch(get_values(chunk, tiles_count))
+        except ValueError:
+            for puzzle in chunk:
+                solution, is_solved = solve_or_report(puzzle, puzzles_count + 1, solver_type)
+                solutions_file.write(solution + "\n")
+                puzzles_count += 1
+                solved_count += is_solved
+            continue
+        is_full = ~np.any(grids == EMPTY_VALUE, axis=(1, 2))
+
+        for puzzle, grid, is_contradiction, is_solved in zip(chunk, grids, contradictions, is_full):
+            if is_contradiction:
+                is_solved = False
+            elif is_solved:
+                solution = grid_to_line(grid)
+            else:
+                solution, is_solved = solve_puzzle(grid, solver_type)
+            if not is_solved:
+                solution = puzzle if isinstance(puzzle, str) else grid_to_line(puzzle)
+            solutions_file.write(solution + "\n")
+            puzzles_count += 1
+            solved_count += is_solved
+
+    return puzzles_count, solved_count, time.time() - start
+
+
+if __name__ == '__main__':
+    args = sys.argv
+    if len(args) not in (3, 4, 5) or args[2] not in SOLVER_TYPES or \
+            (len(args) == 5 and args[4] not in ("true", "false", "vectorized")):
+        print_explanation_and_terminate()
+    propagation = len(args) == 5 and args[4] == "true"
+
+    try:
+        puzzles_file = open_puzzles(args[1])
+        solutions_file = open(args[3], 'w') if len(args) >= 4 and args[3] != '-' else sys.stdout
+    except (OSError, ValueError) as os_error:
+        print(os_error)
+        print_explanation_and_terminate()
+
+    with puzzles_file, solutions_file:
+        if len(args) == 5 and args[4] == "vectorized":
+            puzzles_count, solved_count, total = solve_batch_vectorized(puzzles_file, solutions_file,
+                                                                        SOLVER_TYPES[args[2]])
+        else:
+            puzzles_count, solved_count, total = solve_batch(puzzles_file, solutions_file, SOLVER_TYPES[args[2]],
+                                                               propagation)
+
+    print(SOLVER_TYPES[args[2]], "solved", solved_count, "of", puzzles_count, "puzzles in", round(total, 3), "seconds,",
+          round(puzzles_count / total if total else 0, 1), "puzzles per second", file=sys.stderr)
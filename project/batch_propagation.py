@@ -0,0 +1,91 @@
+from util import EMPTY_VALUE, Geometry, get_block_size
+import numpy as np
+
+_units_matrices = {}
+
+
+def get_units_matrix(block_size):
+    """
+    the (units, tiles) float32 matrix of a grid, 1 where the tile is in the unit (the units of Geometry: the rows, the
+    columns and the blocks)
+    """
+    if block_size not in _units_matrices:
+        geometry = Geometry.get(block_size)
+        units_matrix = np.zeros((len(geometry.units_indexes), geometry.tiles_count), dtype=np.float32)
+        for unit_index, unit in enumerate(geometry.units_indexes):
+            units_matrix[unit_index, list(unit)] = 1
+        _units_matrices[block_size] = units_matrix
+    return _units_matrices[block_size]
+
+
+class BatchTensors:
+    """
+    The tensors of a batch are (tiles, count, size): tile first, so that summing over every unit of every puzzle of
+    the batch is a single matrix product of the units matrix with the tensor (seen as tiles x (count * size)).
+    """
+
+    def __init__(self, block_size):
+        self.size = block_size * block_size
+        self.units_matrix = get_units_matrix(block_size)
+        self.values = np.arange(1, self.size + 1, dtype=np.uint8)
+
+    def get_one_hot(self, grids):
+        """the tensor of (tiles, count) grids, True at [tile, puzzle, value - 1]"""
+        return grids[:, :, None] == self.values
+
+    def get_unit_counts(self, tensor):
+        """the (units, count, size) sums of the tensor over every unit"""
+        tiles_count, count, size = tensor.shape
+        return (self.units_matrix @ tensor.reshape(tiles_count, -1).astype(np.float32)).reshape(-1, count, size)
+
+    def spread(self, unit_tensor):
+        """the tensor that is True where unit_tensor is True for any unit of the tile"""
+        units_count, count, size = unit_tensor.shape
+        spread = self.units_matrix.T @ unit_tensor.reshape(units_count, -1).astype(np.float32)
+        return spread.reshape(-1, count, size) > 0
+
+
+def propagate_batch(grids):
+    """
+    naked singles and hidden singles on all the grids at once, until none of them changes.
+    grids is a (count, size, size) or (count, size * size) array of values (a batch of puzzles of the same size).
+    returns the propagated (count, size, size) grids and a (count,) bool array of the grids with a contradiction
+    (a tile without a value or a unit where a value has no place left): these puzzles have no solution.
+    puzzles without a contradiction and without empty tiles are solved, the rest need a search (see Solver)
+    """
+    count = len(grids)
+    grids = np.array(grids, dtype=np.uint8).reshape(count, -1).T.copy()
+    size = int(round(len(grids) ** 0.5))
+    tensors = BatchTensors(get_block_size(size))
+
+    used = tensors.get_unit_counts(tensors.get_one_hot(grids))
+    contradictions = np.any(used > 1, axis=(0, 2))
+    candidates = (grids == EMPTY_VALUE)[:, :, None] & ~tensors.spread(used > 0)
+    active = np.nonzero(~contradictions & np.any(grids == EMPTY_VALUE, axis=0))[0]
+
+    while len(active):
+        active_grids, active_candidates, active_used = grids[:, active], candidates[:, active], used[:, active]
+        is_empty = active_grids == EMPTY_VALUE
+        counts = active_candidates.sum(axis=2)
+        places = tensors.get_unit_counts(active_candidates)
+        is_contradiction = np.any(is_empty & (counts == 0), axis=0) | \
+            np.any((places == 0) & (active_used == 0), axis=(0, 2))
+
+        # naked singles: the only candidate of a tile. hidden singles: the only place of a value in a unit
+        forced = active_candidates & ((is_empty & (counts == 1))[:, :, None] | tensors.spread(places == 1))
+        forced_counts = forced.sum(axis=2)
+        is_forced = forced_counts == 1
+        active_grids[is_forced] = (forced.argmax(axis=2) + 1)[is_forced]
+
+        # the candidates had none of the values of their units, so a unit can only get a value twice at once
+        forced_used = tensors.get_unit_counts(forced)
+        is_contradiction |= np.any(forced_counts > 1, axis=0) | np.any(forced_used > 1, axis=(0, 2))
+        active_used += forced_used
+        active_candidates &= ~tensors.spread(forced_used > 0) & ~is_forced[:, :, None]
+
+        grids[:, active], candidates[:, active], used[:, active] = active_grids, active_candidates, active_used
+        contradictions[active] = is_contradiction
+        is_changed = np.any(is_forced, axis=0)
+        active = active[is_changed & ~is_contradiction & np.any(active_grids == EMPTY_VALUE, axis=0)]
+
+    return grids.T.reshape(count, size, size), contradictions
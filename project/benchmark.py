@@ -0,0 +1,185 @@
+from sudoku import Sudoku
+from game import SOLVER_TYPES
+from math import ceil
+import tracemalloc
+import time
+import json
+import csv
+import sys
+import os
+
+PUZZLES_DIRECTORY = 'puzzles'
+WARM_UP_RUNS = 1  # not measured, so imports, caches and lookup tables don't count
+TOLERANCE = 0.1  # a median more than 10% slower than the baseline is a regression
+
+NONDETERMINISTIC_SOLVERS = (SOLVER_TYPES['simulated_annealing'], SOLVER_TYPES['multi_chain_simulated_annealing'],
+                            SOLVER_TYPES['portfolio'])
+
+COLUMNS = ['solver', 'puzzle', 'runs', 'solved', 'median_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'min_ms', 'nodes',
+           'actions', 'backtracks', 'prunings', 'max_depth', 'peak_memory_kb']
+
+
+def get_puzzles(directory=PUZZLES_DIRECTORY, size=9):
+    """the puzzle files of the corpus with size x size puzzles, sorted"""
+    puzzles = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.txt'):
+            with open(os.path.join(directory, name)) as puzzle_file:
+                if len(puzzle_file.readline().strip()) == size * size:
+                    puzzles.append(os.path.join(directory, name))
+    return puzzles
+
+
+def percentile(sorted_values, percent):
+    """nearest rank percentile of a sorted list"""
+    return sorted_values[max(ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+def run_once(puzzle, solver_type):
+    """solves the puzzle once, returns the solve time in nanoseconds, whether it was solved, actions and stats"""
+    solver = Sudoku(puzzle, solver_type, trace=False).get_solver()
+    start = time.perf_counter_ns()
+    actions_queue = solver.solve()
+    elapsed = time.perf_counter_ns() - start
+    is_solved = solver.is_solved and Sudoku.is_complete(solver.grid)
+    return elapsed, is_solved, len(actions_queue), solver.stats
+
+
+def measure_peak_memory(puzzle, solver_type):
+    """
+    the peak of the memory allocated by python during one more solve, in KB.
+    in a run of its own since tracemalloc slows everything down
+    """
+    tracemalloc.start()
+    try:
+        run_once(puzzle, solver_type)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def benchmark(puzzle, solver_type, runs):
+    """
+    returns a row of COLUMNS for the solver on the puzzle. the counters are medians (the same on every run for the
+    deterministic solvers)
+    """
+    for _ in range(WARM_UP_RUNS):
+        run_once(puzzle, solver_type)
+
+    times = []
+    counters = {'nodes': [], 'actions': [], 'backtracks': [], 'prunings': [], 'max_depth': []}
+    solved = 0
+    for _ in range(runs):
+        elapsed, is_solved, actions, stats = run_once(puzzle, solver_type)
+        times.append(elapsed / 1e6)
+        solved += is_solved
+        counters['actions'].append(actions)
+        for counter in ('nodes', 'backtracks', 'prunings', 'max_depth'):
+            counters[counter].append(getattr(stats, counter))
+
+    times.sort()
+    row = {'solver': solver_type,
+           'puzzle': os.path.basename(puzzle),
+           'runs': runs,
+           'solved': solved,
+           'median_ms': round(percentile(times, 50), 3),
+           'p95_ms': round(percentile(times, 95), 3),
+           'p99_ms': round(percentile(times, 99), 3),
+           'mean_ms': round(sum(times) / runs, 3),
+           'min_ms': round(times[0], 3),
+           'peak_memory_kb': measure_peak_memory(puzzle, solver_type)}
+    for counter, values in counters.items():
+        row[counter] = sorted(values)[runs // 2]
+    return row
+
+
+def benchmark_suite(solver_types, puzzles, runs):
+    results = []
+    for puzzle in puzzles:
+        for solver_type in solver_types:
+            results.append(benchmark(puzzle, solver_type, runs))
+            print(puzzle, solver_type, "median:", results[-1]['median_ms'], "ms", file=sys.stderr, flush=True)
+    return results
+
+
+def write_results(results, output_file, output_format):
+    if output_format == 'json':
+        json.dump(results, output_file, indent=1)
+        output_file.write("\n")
+    else:
+        writer = csv.DictWriter(output_file, COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def compare_to_baseline(results, baseline):
+    """
+    returns a line for every result whose median is more than TOLERANCE slower than the baseline's, or whose nodes
+    changed (a deterministic solver that expands different nodes is not doing the same search anymore)
+    """
+    baseline_rows = {(row['solver'], row['puzzle']): row for row in baseline}
+    regressions = []
+    for row in results:
+        base = baseline_rows.get((row['solver'], row['puzzle']))
+        if base is None:
+            continue
+        if row['median_ms'] > base['median_ms'] * (1 + TOLERANCE):
+            regressions.append(row['solver'] + " on " + row['puzzle'] + ": median " + str(base['median_ms']) +
+                               " -> " + str(row['median_ms']) + " ms")
+        if row['solved'] == row['runs'] == base['solved'] == base['runs'] and row['nodes'] != base['nodes'] and \
+                row['solver'] not in NONDETERMINISTIC_SOLVERS:
+            regressions.append(row['solver'] + " on " + row['puzzle'] + ": nodes " + str(base['nodes']) + " -> " +
+                               str(row['nodes']))
+    return regressions
+
+
+def print_explanation_and_terminate():
+    print("USAGE: <runs> <output-path.csv|output-path.json|-> [baseline-path.json] [solver=<" +
+          "|".join(SOLVER_TYPES) + ">...] [puzzle-path.txt...]")
+    print("benchmarks every solver (or the given solvers) on every 9x9 puzzle of " + PUZZLES_DIRECTORY + "/ (or the "
+          "given puzzles) and writes the results as CSV or JSON ('-' for CSV on stdout).")
+    print("if the baseline exists the results are compared to it and the regressions are reported (exit code 1), "
+          "otherwise the results are saved as the baseline")
+    print("example: 20 results.csv puzzles/baseline.json csp dancing_links puzzles/hard.txt puzzles/16x16.txt")
+    exit(-1)
+
+
+if __name__ == '__main__':
+    args = sys.argv
+    if len(args) < 3:
+        print_explanation_and_terminate()
+    try:
+        runs = int(args[1])
+    except ValueError:
+        print_explanation_and_terminate()
+    baseline_path = args[3] if len(args) > 3 and args[3].endswith('.json') else None
+    names = args[4 if baseline_path else 3:]
+    puzzles = [name for name in names if name.endswith('.txt')] or get_puzzles()
+    solver_names = [name for name in names if not name.endswith('.txt')] or \
+                   [name for name in SOLVER_TYPES if name != 'portfolio']
+    if runs < 1 or any(name not in SOLVER_TYPES for name in solver_names) or \
+            not all(os.path.exists(puzzle) for puzzle in puzzles):
+        print_explanation_and_terminate()
+
+    results = benchmark_suite([SOLVER_TYPES[name] for name in solver_names], puzzles, runs)
+
+    if args[2] == '-':
+        write_results(results, sys.stdout, 'csv')
+    else:
+        with open(args[2], 'w', newline='') as output_file:
+            write_results(results, output_file, 'json' if args[2].endswith('.json') else 'csv')
+
+    if baseline_path is not None:
+        if not os.path.exists(baseline_path):
+            with open(baseline_path, 'w') as baseline_file:
+                write_results(results, baseline_file, 'json')
+            print("saved the baseline to", baseline_path, file=sys.stderr)
+        else:
+            with open(baseline_path) as baseline_file:
+                regressions = compare_to_baseline(results, json.load(baseline_file))
+            for regression in regressions:
+                print("REGRESSION:", regression, file=sys.stderr)
+            if regressions:
+                exit(1)
+            print("no regressions against", baseline_path, file=sys.stderr)
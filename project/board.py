@@ -5,56 +5,101 @@ import util
 
 class Board:
 
+    MAX_BOARD_SIZE = 720  # bigger grids get smaller squares
+    FRAME_RATE = 60  # frames a second at most during a replay
+    REPLAY_TIME = 10  # seconds a long replay takes by default, short ones go at one action every util.delay
 
     def __init__(self, grid_values):
         self.__graphic_grid = grid_values
+        self.__size = len(grid_values)
+        self.__block_size = util.get_block_size(self.__size)
+        self.__square_size = min(Tile.SQUARE_SIZE, self.MAX_BOARD_SIZE // self.__size - 1)
         pygame.init()
         pygame.display.set_caption('Sudoku')
-        self.__screen = pygame.display.set_mode((400, 400))
-        board = pygame.image.load('board.png')
-        self.__screen.blit(board, (10, 10))
+        if self.__size == 9:
+            self.__screen = pygame.display.set_mode((400, 400))
+            board = pygame.image.load('board.png')
+            self.__screen.blit(board, (10, 10))
+        else:
+            # no image for this size, the lines are the background showing between the squares
+            board_size = self.__size * (self.__square_size + 1) + 4 * self.__block_size + 2
+            self.__screen = pygame.display.set_mode((board_size + 20, board_size + 20))
+            self.__screen.fill(pygame.color.THECOLORS['black'], pygame.Rect(10, 10, board_size, board_size))
 
+        self.__dirty_rects = []  # the squares drawn since the last update of the display
         self.__tiles = self.__create_tiles(10, 10)
+        pygame.display.update()
         pygame.event.set_blocked(pygame.MOUSEMOTION)
 
     def __create_tiles(self, init_x, init_y):
         tiles = list()
-        x = y = 0
-        for row in range(0, 9):
+        step = self.__square_size + 1
+        for row in range(0, self.__size):
             board_row = list()
-            for col in range(0, 9):
-                if col in (0, 1, 2):
-                    x = (col * 41) + (init_x + 2)
-                if col in (3, 4, 5):
-                    x = (col * 41) + (init_x + 6)
-                if col in (6, 7, 8):
-                    x = (col * 41) + (init_x + 10)
-                if row in (0, 1, 2):
-                    y = (row * 41) + (init_y + 2)
-                if row in (3, 4, 5):
-                    y = (row * 41) + (init_y + 6)
-                if row in (6, 7, 8):
-                    y = (row * 41) + (init_y + 10)
-
-                tile = Tile(self.__graphic_grid[row][col], x, y, col, row)
+            for col in range(0, self.__size):
+                # a 1 pixel line between tiles and a 4 pixels line between blocks
+                x = (col * step) + (init_x + 2 + 4 * (col // self.__block_size))
+                y = (row * step) + (init_y + 2 + 4 * (row // self.__block_size))
+
+                tile = Tile(self.__graphic_grid[row][col], x, y, col, row, self.__square_size)
                 board_row.append(tile)
 
             tiles.append(board_row)
 
         return tiles
 
-    def insert(self, x_pos, y_pos, new_value):
-        self.__graphic_grid[y_pos][x_pos] = new_value
-        self.__tiles[x_pos][y_pos].update_value(new_value)
-        pygame.display.update()
-        time.sleep(util.delay)
+    def insert(self, row, col, new_value):
+        """draws new_value in the tile, it shows on the display on the next update"""
+        self.__graphic_grid[row][col] = new_value
+        self.__dirty_rects.append(self.__tiles[row][col].update_value(new_value))
+
+    def update(self):
+        """updates only the squares drawn since the last update on the display"""
+        pygame.display.update(self.__dirty_rects)
+        self.__dirty_rects = []
+
+    def replay(self, actions_queue, actions_per_second=None):
+        """
+        plays the actions of a solver (see util.ActionsTrace) at actions_per_second, by default one every util.delay,
+        or faster so it takes at most REPLAY_TIME seconds.
+        every frame (FRAME_RATE a second at most) plays all the actions due by then, draws every tile they changed once
+        and updates only these tiles on the display, so a fast replay isn't slowed down by drawing every action.
+        returns the number of actions played, fewer if the window is closed
+        """
+        if actions_per_second is None:
+            actions_per_second = max(1 / util.delay, len(actions_queue) / self.REPLAY_TIME)
+        clock = pygame.time.Clock()
+        start = time.perf_counter()
+        played = 0
+        while actions_queue:
+            due = int((time.perf_counter() - start) * actions_per_second) + 1
+            frame_values = {}  # (row, col) -> its last value in the frame, a tile is drawn once a frame
+            while actions_queue and played < due:
+                action = actions_queue.popleft()
+                if action.id == util.Action.INSERT:
+                    frame_values[action.y, action.x] = action.value
+                elif action.id == util.Action.DELETE:
+                    frame_values[action.y, action.x] = util.EMPTY_VALUE
+                played += 1
+            for (row, col), value in frame_values.items():
+                self.insert(row, col, value)
+            self.update()
+
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            clock.tick(self.FRAME_RATE)
+        return played
 
 
 class Tile:
 
     SQUARE_SIZE = 40
-    def __init__(self, value, graphic_x, graphic_y, grid_x, grid_y):
+    FONT_SIZE = 30  # for a SQUARE_SIZE square
+    __fonts = {}  # font size -> the font, loaded once
+    __glyphs = {}  # (font size, value, color) -> the value rendered, rendered once
+    def __init__(self, value, graphic_x, graphic_y, grid_x, grid_y, square_size=SQUARE_SIZE):
         self.__value = value
+        self.__font_size = self.FONT_SIZE * square_size // self.SQUARE_SIZE
         self.__grid_x = grid_x
         self.__grid_y = grid_y
         self.__read_only = self.__value != util.EMPTY_VALUE
@@ -65,30 +110,38 @@ class Tile:
             self.__font_color = pygame.color.THECOLORS["black"]
 
         self.__screen  = pygame.display.get_surface()
-        self.__color_square = pygame.Surface((self.SQUARE_SIZE, self.SQUARE_SIZE)).convert()
+        self.__color_square = pygame.Surface((square_size, square_size)).convert()
         self.__color_square.fill(pygame.color.THECOLORS['white'], None, pygame.BLEND_RGB_ADD)
         self.__color_square_rect = self.__color_square.get_rect()
         self.__color_square_rect = self.__color_square_rect.move(graphic_x + 1, graphic_y + 1)
-        self.__rect = pygame.Rect(graphic_x, graphic_y, self.SQUARE_SIZE, self.SQUARE_SIZE)
+        self.__rect = pygame.Rect(graphic_x, graphic_y, square_size, square_size)
+        self.__dirty_rect = self.__rect.union(self.__color_square_rect)  # all that __draw covers
 
         self.__draw()
 
-    def __draw(self):
-        value = ''
-        if self.__value != util.EMPTY_VALUE:
-            value = self.__value
+    def __get_glyph(self, value):
+        key = (self.__font_size, value, tuple(self.__font_color))
+        if key not in Tile.__glyphs:
+            if self.__font_size not in Tile.__fonts:
+                Tile.__fonts[self.__font_size] = pygame.font.Font('comic_sans.ttf', self.__font_size)
+            text = util.value_to_char(value) if value != util.EMPTY_VALUE else ''
+            Tile.__glyphs[key] = Tile.__fonts[self.__font_size].render(text, 1, self.__font_color)
+        return Tile.__glyphs[key]
 
-        font = pygame.font.Font('comic_sans.ttf', 30)
-        text = font.render(str(value), 1, self.__font_color)
+    def __draw(self):
+        """draws the tile on the screen, returns the rect it covered"""
+        text = self.__get_glyph(self.__value)
         textpos = text.get_rect()
         textpos.centerx = self.__rect.centerx
         textpos.centery = self.__rect.centery
         self.__screen.blit(self.__color_square, self.__color_square_rect)
         self.__screen.blit(text, textpos)
+        return self.__dirty_rect
 
     def update_value(self, value):
+        """returns the rect to update on the display"""
         self.__value = value
-        self.__draw()
+        return self.__draw()
 
     def is_read_only(self):
         return self.__read_only
@@ -0,0 +1,77 @@
+import threading
+import time
+
+# why a solve was stopped before it finished
+TIME_LIMIT = 'time limit'
+NODES_LIMIT = 'nodes limit'
+CANCELLED = 'cancelled'
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation: the solver checks the token in its main loop and stops when it is cancelled.
+    By default it works between threads, give it a multiprocessing Event (e.g. from a Manager or a Pool initializer)
+    to cancel a solve running in another process.
+    """
+
+    def __init__(self, event=None):
+        self.event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def is_cancelled(self):
+        return self.event.is_set()
+
+
+class Budget:
+    """
+    Limits a single solve to time_limit seconds and/or max_nodes nodes, and stops it when token is cancelled.
+    A node is a step of the solver's main loop: an assignment of the search, a dancing links row or an annealing
+    iteration. The solver calls is_exhausted once per node, the clock starts on the first call.
+    The clock and the token are only checked every CHECK_INTERVAL nodes, they cost much more than counting.
+    """
+    CHECK_INTERVAL = 256
+
+    def __init__(self, time_limit=None, max_nodes=None, token=None):
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.token = token
+        self.nodes = 0
+        self.start_time = None
+        self.end_time = None
+        self.stop_reason = None  # one of TIME_LIMIT, NODES_LIMIT and CANCELLED once the solve was stopped
+        # called with no arguments every CHECK_INTERVAL nodes, see Solver.set_progress_callback
+        self.progress_hook = None
+
+    def is_unlimited(self):
+        return self.time_limit is None and self.max_nodes is None and self.token is None
+
+    def is_exhausted(self):
+        """counts a node, returns True if the solver should stop"""
+        if self.stop_reason is not None:
+            return True
+        if self.start_time is None:
+            self.start_time = time.time()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.stop(NODES_LIMIT)
+            return True
+        self.nodes += 1
+        if self.nodes % self.CHECK_INTERVAL == 0:
+            if self.progress_hook is not None:
+                self.progress_hook()
+            if self.time_limit is not None and time.time() - self.start_time > self.time_limit:
+                self.stop(TIME_LIMIT)
+            elif self.token is not None and self.token.is_cancelled():
+                self.stop(CANCELLED)
+        return self.stop_reason is not None
+
+    def stop(self, reason):
+        self.stop_reason = reason
+        self.end_time = time.time()
+
+    def get_elapsed(self):
+        """seconds from the first node to the stop (or to now if it wasn't stopped)"""
+        if self.start_time is None:
+            return 0
+        return (self.end_time or time.time()) - self.start_time
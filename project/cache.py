@@ -0,0 +1,193 @@
+from util import EMPTY_VALUE, get_block_size, grid_to_line
+from sudoku import Sudoku
+from solvers import Solver
+from collections import OrderedDict
+from itertools import permutations, product
+import numpy as np
+import shelve
+
+CANONICAL_BLOCK_SIZE = 3  # bigger grids have too many column orders (7962624 for 16x16), they are cached as they are
+# puzzles with fewer clues (no unique solution) are cached as they are: their rows tie, up to 2592 * 1296 candidates
+MIN_CANONICAL_CLUES = 17
+# and so are the puzzles whose rows tie for more candidates than that (puzzles with a unique solution tie for a few
+# thousands at most)
+MAX_CANDIDATES = 20000
+
+
+def get_column_orders(block_size):
+    """
+    every order of the columns that keeps them in stacks: an order of the stacks and an order of the columns in each
+    stack (1296 for a 9x9 grid)
+    """
+    orders = []
+    for stacks in permutations(range(block_size)):
+        for columns in product(permutations(range(block_size)), repeat=block_size):
+            orders.append([stack * block_size + columns[index][column]
+                           for index, stack in enumerate(stacks) for column in range(block_size)])
+    return np.array(orders)
+
+
+COLUMN_ORDERS = get_column_orders(CANONICAL_BLOCK_SIZE)
+
+
+class Transform:
+    """
+    A symmetry of the sudoku: the canonical grid is the grid (transposed or not) with its rows taken in rows order,
+    its columns taken in columns order and its values relabeled with labels (labels[value] is the new value).
+    """
+
+    def __init__(self, transpose, rows, columns, labels):
+        self.transpose = transpose
+        self.rows = rows
+        self.columns = columns
+        self.labels = labels
+
+    @staticmethod
+    def identity(size):
+        return Transform(False, np.arange(size), np.arange(size), np.arange(size + 1))
+
+    def to_canonical(self, grid):
+        grid = grid.T if self.transpose else grid
+        return self.labels[grid[np.ix_(self.rows, self.columns)]]
+
+    def to_original(self, canonical_grid):
+        values = np.zeros_like(self.labels)
+        values[self.labels] = np.arange(len(self.labels))
+        grid = np.zeros_like(canonical_grid)
+        grid[np.ix_(self.rows, self.columns)] = values[canonical_grid]
+        return grid.T if self.transpose else grid
+
+
+def canonicalize(grid):
+    """
+    returns the canonical form of the puzzle and the transform to it.
+    puzzles that are the same up to relabeling the values, swapping rows in a band, columns in a stack, bands, stacks
+    and transposing have the same canonical form: the transformed grid that is the smallest row by row, with the values
+    labeled by order of appearance (empty tiles first).
+    Every candidate transform starts from a column order and a transpose, and gets its rows one at a time. After every
+    row only the candidates with the smallest rows so far are kept, so few of them get past the first rows.
+    a grid of another block size, with fewer than MIN_CANONICAL_CLUES clues or that keeps more than MAX_CANDIDATES
+    candidates is its own canonical form
+    """
+    size = len(grid)
+    block_size = get_block_size(size)
+    if block_size != CANONICAL_BLOCK_SIZE or np.count_nonzero(grid) < MIN_CANONICAL_CLUES:
+        return grid.copy(), Transform.identity(size)
+
+    grids = np.array([grid, grid.T])
+    candidates_count = 2 * len(COLUMN_ORDERS)
+    transposes = np.repeat([0, 1], len(COLUMN_ORDERS))
+    columns = np.tile(COLUMN_ORDERS, (2, 1))
+    rows = np.zeros((candidates_count, 0), dtype=int)
+    labels = np.zeros((candidates_count, size + 1), dtype=int)
+    next_labels = np.ones(candidates_count, dtype=int)
+    row_weights = (size + 1) ** np.arange(size - 1, -1, -1)
+
+    for level in range(size):
+        # the rows each candidate can take next: the rest of its band, or the first row of any band left
+        used = np.zeros((len(rows), size), dtype=bool)
+        used[np.arange(len(rows))[:, None], rows] = True
+        allowed = ~used
+        if level % block_size:
+            band = rows[:, level - level % block_size] // block_size
+            allowed &= np.arange(size)[None, :] // block_size == band[:, None]
+        options = allowed.sum(axis=1)[0]
+        next_rows = np.nonzero(allowed)[1]
+
+        expanded = np.repeat(np.arange(len(rows)), options)
+        transposes, columns, labels, next_labels = (transposes[expanded], columns[expanded], labels[expanded].copy(),
+                                                    next_labels[expanded].copy())
+        rows = np.concatenate((rows[expanded], next_rows[:, None]), axis=1)
+
+        values = grids[transposes[:, None], next_rows[:, None], columns]
+        indexes = np.arange(len(rows))
+        for column in range(size):
+            value = values[:, column]
+            is_new = (value != EMPTY_VALUE) & (labels[indexes, value] == 0)
+            labels[indexes[is_new], value[is_new]] = next_labels[is_new]
+            next_labels += is_new
+        row_keys = labels[indexes[:, None], values] @ row_weights
+
+        best = row_keys == row_keys.min()
+        if np.count_nonzero(best) > MAX_CANDIDATES:
+            return grid.copy(), Transform.identity(size)
+        transposes, columns, rows, labels, next_labels = (transposes[best], columns[best], rows[best], labels[best],
+                                                          next_labels[best])
+
+    # the values that are not in the puzzle get the labels left, in order
+    labels = labels[0]
+    missing_values = [value for value in range(1, size + 1) if labels[value] == 0]
+    labels[missing_values] = np.arange(next_labels[0], size + 1)
+
+    transform = Transform(bool(transposes[0]), rows[0], columns[0], labels)
+    return transform.to_canonical(grid), transform
+
+
+class SolutionCache:
+    """
+    Solutions of puzzles by their canonical form (see canonicalize), so a puzzle that is isomorphic to a solved one
+    is solved by mapping the cached solution back with the transform.
+    Keeps the capacity most recently used solutions in memory, and with a path all the solutions on the disk too
+    (a shelve, a hit on the disk is brought back to memory).
+    """
+
+    def __init__(self, capacity=4096, path=None):
+        self.capacity = capacity
+        self.solutions = OrderedDict()  # canonical puzzle line -> canonical solution line, least recently used first
+        self.store = shelve.open(path) if path is not None else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.solutions:
+            self.solutions.move_to_end(key)
+            return self.solutions[key]
+        if self.store is not None and key in self.store:
+            self.__remember(key, self.store[key])
+            return self.solutions[key]
+        return None
+
+    def put(self, key, solution):
+        self.__remember(key, solution)
+        if self.store is not None:
+            self.store[key] = solution
+
+    def __remember(self, key, solution):
+        self.solutions[key] = solution
+        self.solutions.move_to_end(key)
+        if len(self.solutions) > self.capacity:
+            self.solutions.popitem(last=False)
+
+    def solve(self, solver):
+        """
+        solves with solver, unless the solution of an isomorphic puzzle is cached: then the solution is inserted to
+        the empty tiles of the solver's grid, as if the solver found it without a mistake.
+        returns the solver's actions, like solver.solve
+        """
+        canonical_grid, transform = canonicalize(solver.grid)
+        key = grid_to_line(canonical_grid)
+        solution = self.get(key)
+        if solution is not None:
+            self.hits += 1
+            grid = transform.to_original(Sudoku.parse_puzzle(solution)[0])
+            for y, x in zip(*np.nonzero(solver.grid == EMPTY_VALUE)):
+                Solver.insert(solver, x, y, grid[y][x])  # without the solvers' bookkeeping, they don't search
+            solver.is_solved = True
+            return solver.actions_queue
+
+        self.misses += 1
+        actions_queue = solver.solve()
+        if solver.is_solved and Sudoku.is_complete(solver.grid):
+            self.put(key, grid_to_line(transform.to_canonical(solver.grid)))
+        return actions_queue
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
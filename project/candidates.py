@@ -0,0 +1,99 @@
+from util import EMPTY_VALUE, get_block_size
+
+MAX_TABLE_SIZE = 16  # bigger grids compute the values of a mask instead of looking them up (2^25 masks is too much)
+
+
+class MaskValues:
+    """
+    mask -> its values (bit i stands for value i + 1), computed on every lookup. for grids too big for a table
+    """
+
+    def __getitem__(self, mask):
+        values = []
+        value = 1
+        while mask:
+            if mask & 1:
+                values.append(value)
+            mask >>= 1
+            value += 1
+        return tuple(values)
+
+
+class MaskCounts:
+    """mask -> the number of values in it, computed on every lookup. for grids too big for a table"""
+
+    def __getitem__(self, mask):
+        return bin(mask).count('1')
+
+
+_mask_tables = {}
+
+
+def get_mask_tables(size):
+    """
+    returns for a size x size grid the table of the values of every size-bits mask and the table of their counts
+    """
+    if size not in _mask_tables:
+        if size <= MAX_TABLE_SIZE:
+            values = tuple(tuple(value for value in range(1, size + 1) if mask & (1 << (value - 1)))
+                           for mask in range(1 << size))
+            _mask_tables[size] = values, tuple(len(mask_values) for mask_values in values)
+        else:
+            _mask_tables[size] = MaskValues(), MaskCounts()
+    return _mask_tables[size]
+
+
+class Candidates:
+    """
+    Keeps a mask of the used values for every row, column and block of the grid (one bit per value).
+    The masks are updated on every insert/delete so the legal values of a tile are found with a couple of bitwise
+    operations and a table lookup, without allocating anything.
+    The masks assume a value appears at most once in each row/column/block.
+    """
+
+    def __init__(self, grid):
+        self.size = len(grid)
+        self.block_size = get_block_size(self.size)
+        self.full_mask = (1 << self.size) - 1
+        self.mask_values, self.mask_counts = get_mask_tables(self.size)
+        self.rows = [0] * self.size
+        self.columns = [0] * self.size
+        self.blocks = [0] * self.size
+        for y in range(self.size):
+            for x in range(self.size):
+                if grid[y][x] != EMPTY_VALUE:
+                    self.insert(x, y, grid[y][x])
+
+    def insert(self, x, y, value):
+        bit = 1 << (value - 1)
+        self.rows[y] |= bit
+        self.columns[x] |= bit
+        self.blocks[y // self.block_size * self.block_size + x // self.block_size] |= bit
+
+    def delete(self, x, y, value):
+        bit = ~(1 << (value - 1))
+        self.rows[y] &= bit
+        self.columns[x] &= bit
+        self.blocks[y // self.block_size * self.block_size + x // self.block_size] &= bit
+
+    def get_mask(self, x, y):
+        """
+        returns the mask of the legal values at tile (x,y)
+        """
+        return self.full_mask & ~(self.rows[y] | self.columns[x] |
+                                  self.blocks[y // self.block_size * self.block_size + x // self.block_size])
+
+    def get_legal_values(self, x, y):
+        """
+        returns the legal values at tile (x,y), sorted
+        """
+        return self.mask_values[self.get_mask(x, y)]
+
+    def get_legal_values_count(self, x, y):
+        return self.mask_counts[self.get_mask(x, y)]
+
+    def get_column_free_values(self, x):
+        """
+        returns the values that are not used in column x, sorted
+        """
+        return self.mask_values[self.full_mask & ~self.columns[x]]
@@ -0,0 +1,206 @@
+from util import get_block_size, grid_to_line, line_to_values
+import numpy as np
+import struct
+import time
+import os
+import sys
+
+EXTENSION = '.sdk'
+MAGIC = b'SDKC'
+VERSION = 1
+BYTES = 0  # a byte per tile, 81 bytes per 9x9 puzzle
+NIBBLES = 1  # half a byte per tile, 41 bytes per 9x9 puzzle (only up to 15 values, so only 9x9)
+HEADER = struct.Struct('<4sBBBxQ')  # magic, version, size, packing, the number of puzzles
+MAX_NIBBLE_SIZE = 15
+
+
+def get_record_size(size, packing):
+    tiles_count = size * size
+    return tiles_count if packing == BYTES else (tiles_count + 1) // 2
+
+
+def pack_records(grids, packing):
+    """
+    grids is a (count, size, size) or (count, size * size) array of values, returns the (count, record size) uint8
+    records
+    in a nibbles record tile 2i is the high half of byte i and tile 2i + 1 the low half
+    """
+    tiles = np.asarray(grids, dtype=np.uint8).reshape(len(grids), -1)
+    if packing == BYTES:
+        return tiles
+    if tiles.shape[1] % 2:
+        tiles = np.concatenate((tiles, np.zeros((len(tiles), 1), dtype=np.uint8)), axis=1)
+    return (tiles[:, 0::2] << 4) | tiles[:, 1::2]
+
+
+def unpack_records(records, size, packing):
+    """the (count, size, size) grids of (count, record size) records"""
+    if packing == BYTES:
+        return records.reshape(len(records), size, size)
+    tiles = np.stack((records >> 4, records & 0xF), axis=-1).reshape(len(records), -1)
+    return tiles[:, :size * size].reshape(len(records), size, size)
+
+
+def get_values(puzzles, tiles_count):
+    """
+    the (count, tiles_count) values of a list of puzzles (lines or grids), lines are looked up all at once.
+    raises ValueError if a puzzle is not of tiles_count tiles or has a value above the grid size
+    """
+    if any(len(puzzle) != tiles_count if isinstance(puzzle, str) else np.size(puzzle) != tiles_count
+           for puzzle in puzzles):
+        raise ValueError("all the puzzles of a corpus have the same size")
+    if all(isinstance(puzzle, str) for puzzle in puzzles):
+        values = line_to_values(''.join(puzzles)).reshape(-1, tiles_count)
+    else:
+        values = np.array([line_to_values(puzzle) if isinstance(puzzle, str) else np.asarray(puzzle).reshape(-1)
+                           for puzzle in puzzles])
+    size = int(round(tiles_count ** 0.5))
+    if np.any(values > size):
+        raise ValueError("the values of a " + str(size) + "x" + str(size) + " puzzle are 1 to " + str(size))
+    return values
+
+
+def write_corpus(path, puzzles, packing=BYTES, chunk_size=65536):
+    """
+    writes the puzzles (lines like in the puzzles files, or grids) to a corpus file, chunk_size puzzles at a time.
+    all the puzzles must have the same size. returns the number of puzzles written.
+    raises ValueError if a puzzle is not a puzzle of that size (see get_values), the file is removed then: its header
+    would still be the placeholder
+    """
+    with open(path, 'wb') as corpus_file:
+        try:
+            return _write_records(corpus_file, puzzles, packing, chunk_size)
+        except BaseException:
+            corpus_file.close()
+            os.remove(path)
+            raise
+
+
+def _write_records(corpus_file, puzzles, packing, chunk_size):
+    """writes the header and the records of write_corpus, returns the number of puzzles written"""
+    count = 0
+    size = None
+    corpus_file.write(HEADER.pack(MAGIC, VERSION, 0, packing, 0))  # the real header is written at the end
+    chunk = []
+    for puzzle in puzzles:
+        if size is None:
+            tiles_count = len(puzzle) if isinstance(puzzle, str) else np.size(puzzle)
+            size = get_block_size(int(round(tiles_count ** 0.5))) ** 2
+            if packing == NIBBLES and size > MAX_NIBBLE_SIZE:
+                raise ValueError("a " + str(size) + "x" + str(size) + " grid doesn't fit in nibbles")
+        chunk.append(puzzle)
+        if len(chunk) == chunk_size:
+            corpus_file.write(pack_records(get_values(chunk, size * size), packing).tobytes())
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        corpus_file.write(pack_records(get_values(chunk, size * size), packing).tobytes())
+        count += len(chunk)
+
+    corpus_file.seek(0)
+    corpus_file.write(HEADER.pack(MAGIC, VERSION, size or 0, packing, count))
+    return count
+
+
+class Corpus:
+    """
+    A corpus file opened with a memory map: opening it reads only the header, and puzzles are read from the disk
+    when they are accessed, by index.
+    For a corpus of bytes records, corpus[index] and get_grids are zero copy views of the file.
+    Nibbles records are unpacked on access, they take half the disk and the page cache.
+    The grids are read only uint8 arrays, Sudoku(puzzle=grid) copies them to a grid of its own.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as corpus_file:
+            header = corpus_file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(path + " is not a corpus file")
+        magic, version, self.size, self.packing, self.count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + " is not a corpus file of version " + str(VERSION))
+
+        self.records = None
+        if self.count:
+            self.records = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER.size,
+                                     shape=(self.count, get_record_size(self.size, self.packing)))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """the grid of puzzle index (negative indexes count from the end)"""
+        if not -self.count <= index < self.count:
+            raise IndexError("puzzle " + str(index) + " of a corpus of " + str(self.count))
+        return unpack_records(self.records[index:index + 1 or None], self.size, self.packing)[0]
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def get_grids(self, start=0, stop=None):
+        """the (count, size, size) grids of the puzzles from start to stop"""
+        if not self.count:
+            return np.zeros((0, self.size, self.size), dtype=np.uint8)
+        return unpack_records(self.records[start:stop], self.size, self.packing)
+
+    def get_line(self, index):
+        """puzzle index as a line of the puzzles files"""
+        return grid_to_line(self[index])
+
+    def close(self):
+        """the file is unmapped once the grids taken from it are gone too"""
+        self.records = None
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def print_explanation_and_terminate():
+    print("USAGE: <puzzles-path|-> <corpus-path> [packing=<bytes|nibbles>]")
+    print("       <corpus-path>")
+    print("converts a file with one puzzle per line ('-' for stdin) to a corpus file, "
+          "or prints how long it takes to open a corpus and read all its puzzles")
+    print("example: puzzles.txt puzzles" + EXTENSION + " nibbles")
+    exit(-1)
+
+
+if __name__ == '__main__':
+    args = sys.argv
+    if len(args) not in (2, 3, 4) or (len(args) == 4 and args[3] not in ('bytes', 'nibbles')):
+        print_explanation_and_terminate()
+
+    if len(args) == 2:
+        start = time.time()
+        try:
+            corpus = Corpus(args[1])
+        except (OSError, ValueError) as error:
+            print(error)
+            print_explanation_and_terminate()
+        opened = time.time()
+        with corpus:
+            count = len(corpus)
+            filled = sum(int(np.count_nonzero(corpus.get_grids(chunk, chunk + 65536)))
+                         for chunk in range(0, count, 65536))
+        end = time.time()
+        print(count, str(corpus.size) + "x" + str(corpus.size), "puzzles with", filled, "full tiles. opened in",
+              round((opened - start) * 1000, 3), "ms, read in", round((end - opened) * 1000, 3), "ms")
+    else:
+        packing = NIBBLES if len(args) == 4 and args[3] == 'nibbles' else BYTES
+        try:
+            puzzles_file = sys.stdin if args[1] == '-' else open(args[1])
+        except OSError as os_error:
+            print(os_error)
+            print_explanation_and_terminate()
+        start = time.time()
+        with puzzles_file:
+            try:
+                count = write_corpus(args[2], (line.strip() for line in puzzles_file if line.strip()), packing)
+            except (OSError, ValueError) as error:
+                print(error)
+                print_explanation_and_terminate()
+        print("wrote", count, "puzzles in", round(time.time() - start, 3), "seconds", file=sys.stderr)
@@ -0,0 +1,115 @@
+from batch import open_puzzles, read_puzzles, solve_puzzle
+from budget import Budget
+from game import SOLVER_TYPES
+from sudoku import SolverType
+from multiprocessing import Pool
+import time
+import sys
+
+SOLVED = 'solved'
+UNSOLVED = 'unsolved'
+TIMEOUT = 'timeout'
+INVALID = 'invalid'  # the line is not a puzzle, it is written back as it is
+
+# the portfolio starts processes of its own, the pool's workers are daemonic and can't have children
+FARM_SOLVER_TYPES = [name for name in SOLVER_TYPES if name != 'portfolio']
+
+
+def _init_worker(solver_type, timeout, propagation):
+    """runs once in every worker process"""
+    global _solver_type, _timeout, _propagation
+    _solver_type = solver_type
+    _timeout = timeout
+    _propagation = propagation
+
+
+def _solve_in_worker(puzzle):
+    """
+    solves a puzzle in a worker process.
+    the solver gets a budget of timeout seconds, so it stops by itself and the worker moves on to the next puzzle
+    """
+    start = time.time()
+    budget = Budget(time_limit=_timeout)
+    try:
+        solution, is_solved = solve_puzzle(puzzle, _solver_type, _propagation, budget)
+    except ValueError:
+        return puzzle, INVALID, time.time() - start
+    if is_solved:
+        status = SOLVED
+    else:
+        status = TIMEOUT if budget.stop_reason is not None else UNSOLVED
+
+    return solution, status, time.time() - start
+
+
+class PuzzleFarm:
+    """
+    Solves puzzles on a pool of processes (one per core by default).
+    Puzzles are sent to the workers chunk_size at a time, and the results come back in the order of the puzzles.
+    A puzzle that takes more than timeout seconds is given up and reported as TIMEOUT, a line that is not a puzzle
+    is reported as INVALID.
+    With propagation=True the solvers run the constraint propagation stage.
+    """
+
+    def __init__(self, solver_type, processes=None, chunk_size=16, timeout=None, propagation=False):
+        if solver_type == SolverType.PORTFOLIO:
+            raise ValueError("the portfolio starts processes of its own, it can't run in the farm's daemonic workers")
+        self.solver_type = solver_type
+        self.chunk_size = chunk_size
+        self.pool = Pool(processes, _init_worker, (solver_type, timeout, propagation))
+
+    def solve(self, puzzles):
+        """
+        yields (solution, status, time) for every puzzle, in the order of puzzles.
+        puzzles can be any iterable (e.g. a file being read), it is consumed as the workers need it
+        """
+        return self.pool.imap(_solve_in_worker, puzzles, self.chunk_size)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def print_explanation_and_terminate():
+    print("USAGE: <puzzles-path|-> solver=<" + "|".join(FARM_SOLVER_TYPES) + "> <solutions-path|-> "
+          "[processes] [chunk-size] [timeout-seconds]")
+    print("solves a file with one puzzle per line (81 characters for 9x9, 256 for 16x16) or a corpus file on all "
+          "the cores ('-' for stdin/stdout). solutions are written in the order of the puzzles, unsolved puzzles are "
+          "written back as they are")
+    print("example: puzzles.txt backtracking solutions.txt 32 64 5")
+    exit(-1)
+
+
+if __name__ == '__main__':
+    args = sys.argv
+    if not 4 <= len(args) <= 7 or args[2] not in FARM_SOLVER_TYPES:
+        print_explanation_and_terminate()
+
+    try:
+        processes = int(args[4]) if len(args) > 4 else None
+        chunk_size = int(args[5]) if len(args) > 5 else 16
+        timeout = float(args[6]) if len(args) > 6 else None
+        puzzles_file = open_puzzles(args[1])
+        solutions_file = sys.stdout if args[3] == '-' else open(args[3], 'w')
+    except (OSError, ValueError) as error:
+        print(error)
+        print_explanation_and_terminate()
+
+    counts = {SOLVED: 0, UNSOLVED: 0, TIMEOUT: 0, INVALID: 0}
+    start = time.time()
+    with puzzles_file, solutions_file, PuzzleFarm(SOLVER_TYPES[args[2]], processes, chunk_size, timeout) as farm:
+        for solution, status, _ in farm.solve(read_puzzles(puzzles_file)):
+            solutions_file.write(solution + "\n")
+            counts[status] += 1
+    total = time.time() - start
+
+    puzzles_count = sum(counts.values())
+    print(SOLVER_TYPES[args[2]], "solved", counts[SOLVED], "of", puzzles_count, "puzzles (" + str(counts[TIMEOUT]),
+          "timeouts,", counts[INVALID], "invalid) in", round(total, 3), "seconds,",
+          round(puzzles_count / total if total else 0, 1), "puzzles per second", file=sys.stderr)
@@ -1,17 +1,28 @@
 from sudoku import Sudoku, SolverType
+from budget import Budget
 import sys
 
+SOLVER_TYPES = {"backtracking": SolverType.BACKTRACKING,
+                "csp": SolverType.CSP,
+                "arc": SolverType.ARC_CONSISTENCY,
+                "forward_checking": SolverType.FORWARD_CHECKING,
+                "simulated_annealing": SolverType.SIMULATED_ANNEALING,
+                "dancing_links": SolverType.DANCING_LINKS,
+                "multi_chain_simulated_annealing": SolverType.MULTI_CHAIN_SIMULATED_ANNEALING,
+                "portfolio": SolverType.PORTFOLIO}
+
 
 def print_explanation_and_terminate():
-    print("USAGE: <board-path> solver=<backtracking|csp|arc|forward_checking|simulated_annealing> "
-          "display=<true|false> print=<true|false>")
-    print("example: puzzles/backtracking_hard.txt csp true false")
+    print("USAGE: <board-path> solver=<" + "|".join(SOLVER_TYPES) + "> "
+          "display=<true|false> print=<true|false> [time-limit-seconds|-] [actions-per-second]")
+    print("the display replays the solver's actions at actions-per-second (by default it takes at most 10 seconds)")
+    print("example: puzzles/backtracking_hard.txt csp true false 10 500")
     exit(-1)
 
 
 if __name__ == '__main__':
     args = sys.argv
-    if len(args) != 5:
+    if len(args) not in (5, 6, 7):
         print_explanation_and_terminate()
     filename = args[1]
     try:
@@ -21,13 +32,6 @@ if __name__ == '__main__':
         print(os_error)
         print_explanation_and_terminate()
 
-    SOLVER_TYPES = {"backtracking": SolverType.BACKTRACKING,
-                    "csp": SolverType.CSP,
-                    "arc": SolverType.ARC_CONSISTENCY,
-                    "forward_checking": SolverType.FORWARD_CHECKING,
-                    "simulated_annealing": SolverType.SIMULATED_ANNEALING}
-
-
     try:
         solver_type = SOLVER_TYPES[args[2]]
     except Exception as e:
@@ -41,5 +45,16 @@ if __name__ == '__main__':
     display_enabled = True if args[3] == "true" else False
     print_enabled = True if args[4] == "true" else False
 
-    game = Sudoku(filename, solver_type, display_enabled, print_enabled)
+    budget = None
+    playback_speed = None
+    try:
+        if len(args) >= 6 and args[5] != '-':
+            budget = Budget(time_limit=float(args[5]))
+        if len(args) == 7:
+            playback_speed = float(args[6])
+    except ValueError:
+        print_explanation_and_terminate()
+
+    game = Sudoku(filename, solver_type, display_enabled, print_enabled, budget=budget,
+                  playback_speed=playback_speed)
     game.play()
@@ -0,0 +1,214 @@
+from util import EMPTY_VALUE, grid_to_line
+from sudoku import Sudoku, SolverType
+from batch_propagation import propagate_batch
+from corpus import write_corpus, EXTENSION
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import random
+import time
+import sys
+
+EASY = 'easy'  # naked and hidden singles solve it (see batch_propagation.py)
+MEDIUM = 'medium'  # the propagation stage solves it (see propagation.py)
+HARD = 'hard'  # it needs a search
+DIFFICULTIES = (EASY, MEDIUM, HARD)
+
+# by block size: most random grids get there with a unique solution (2/5 of the tiles for the other sizes)
+DEFAULT_CLUES = {2: 5, 3: 26, 4: 100}
+# by block size: no puzzle with fewer clues has a unique solution (size - 1 for the other sizes, with fewer clues two
+# values never show up and can be swapped)
+MIN_CLUES = {2: 4, 3: 17}
+MAX_SEEDS = 1000  # seeds in a row that miss the targets before generate gives up
+
+
+def get_clues(block_size, clues=None):
+    """the clues target of a grid of block_size (its default if None), raises ValueError if no puzzle can meet it"""
+    size = block_size * block_size
+    if clues is None:
+        return DEFAULT_CLUES.get(block_size, size * size * 2 // 5)
+    if not MIN_CLUES.get(block_size, size - 1) <= clues <= size * size:
+        raise ValueError("a " + str(size) + "x" + str(size) + " puzzle with a unique solution has between " +
+                         str(MIN_CLUES.get(block_size, size - 1)) + " and " + str(size * size) + " clues, not " +
+                         str(clues))
+    return clues
+
+
+def random_full_grid(block_size, rng):
+    """
+    a random full grid of size block_size^2: the blocks on the diagonal share no unit, so they are filled with random
+    permutations of the values and dancing links completes the rest (a different grid for every seed of rng)
+    """
+    size = block_size * block_size
+    grid = np.zeros((size, size), dtype=int)
+    for block in range(block_size):
+        tiles = slice(block * block_size, (block + 1) * block_size)
+        grid[tiles, tiles] = np.array(rng.sample(range(1, size + 1), size)).reshape(block_size, block_size)
+
+    solver = Sudoku(None, SolverType.DANCING_LINKS, puzzle=grid, trace=False).get_solver()
+    solver.solve()
+    return solver.grid
+
+
+def has_other_solution(grid, x, y, value):
+    """
+    whether the puzzle, solved with value in the empty tile (x,y), has a solution with another value there.
+    the puzzles with each other legal value in (x,y) are propagated together first (see propagate_batch): most of
+    them end in a contradiction or a solution. only the rest need a search for any solution (dancing links, see
+    Solver.count_solutions)
+    """
+    other_values = [other_value for other_value in Sudoku.get_legal_values(grid, x, y) if other_value != value]
+    if not other_values:
+        return False
+    grids = np.repeat(grid[None], len(other_values), axis=0)
+    grids[:, y, x] = other_values
+    grids, contradictions = propagate_batch(grids)
+    for other_grid, is_contradiction in zip(grids, contradictions):
+        if is_contradiction:
+            continue
+        if not np.any(other_grid == EMPTY_VALUE):
+            return True
+        if Sudoku(None, SolverType.DANCING_LINKS, puzzle=other_grid, trace=False).get_solver().count_solutions(1):
+            return True
+    return False
+
+
+def get_difficulty(grid):
+    """the difficulty band of a puzzle with a unique solution, by the cheapest technique that solves it"""
+    grids, _ = propagate_batch(grid[None])
+    if not np.any(grids == EMPTY_VALUE):
+        return EASY
+    solver = Sudoku(None, SolverType.BACKTRACKING, puzzle=grid, trace=False, propagation=True).get_solver()
+    is_consistent, _ = solver.propagate()
+    return MEDIUM if is_consistent and not np.any(solver.grid == EMPTY_VALUE) else HARD
+
+
+def remove_clues(solution, rng, clues, difficulty=None):
+    """
+    removes the clues of a full grid in a random order while the solution stays unique and the puzzle isn't harder
+    than difficulty, until at most clues are left and the puzzle is of the difficulty band.
+    every tile is tried once: a clue that can't be removed is kept for good, since removing more clues never makes a
+    solution unique again. and a removal only needs to know whether the removed tile could take another value
+    """
+    grid = solution.copy()
+    size = len(grid)
+    filled = size * size
+    band = DIFFICULTIES.index(difficulty) if difficulty is not None else 0
+    current_band = 0
+    for index in rng.sample(range(size * size), size * size):
+        if filled <= clues and current_band >= band:
+            break
+        x, y = index % size, index // size
+        value = grid[y][x]
+        grid[y][x] = EMPTY_VALUE
+        if has_other_solution(grid, x, y, value):
+            grid[y][x] = value
+            continue
+        if difficulty is not None and (filled <= clues + 1 or difficulty != HARD):
+            removed_band = DIFFICULTIES.index(get_difficulty(grid))
+            if removed_band > band:
+                grid[y][x] = value
+                continue
+            current_band = removed_band
+        filled -= 1
+    return grid
+
+
+def generate_puzzle(seed, block_size=3, clues=None, difficulty=None):
+    """
+    the puzzle line of seed, or None if it didn't get down to clues (see get_clues) or isn't of the difficulty band.
+    the same seed always gives the same puzzle
+    """
+    clues = get_clues(block_size, clues)
+    rng = random.Random(seed)
+    grid = remove_clues(random_full_grid(block_size, rng), rng, clues, difficulty)
+    if np.count_nonzero(grid) > clues or (difficulty is not None and get_difficulty(grid) != difficulty):
+        return None
+    return grid_to_line(grid)
+
+
+def _init_worker(block_size, clues, difficulty):
+    """runs once in every worker process"""
+    global _block_size, _clues, _difficulty
+    _block_size = block_size
+    _clues = clues
+    _difficulty = difficulty
+
+
+def _generate_in_worker(seed):
+    return generate_puzzle(seed, _block_size, _clues, _difficulty)
+
+
+def generate(count, block_size=3, clues=None, difficulty=None, processes=None, seed=0, chunk_size=4,
+             max_seeds=MAX_SEEDS):
+    """
+    yields count puzzles with a unique solution, at most clues clues (see get_clues) and of the difficulty band (any
+    if None), generated on a pool of processes (one per core by default).
+    the puzzles come from the seeds seed, seed + 1... in order, skipping the seeds that miss the targets, so the same
+    arguments give the same puzzles whatever the number of processes.
+    raises ValueError if no puzzle can have clues, RuntimeError once max_seeds seeds in a row missed the targets
+    """
+    clues = get_clues(block_size, clues)
+    processes = processes or cpu_count()
+    next_seed = seed
+    misses = 0
+    with Pool(processes, _init_worker, (block_size, clues, difficulty)) as pool:
+        while count > 0:
+            # a round of seeds at a time, the pool would take an endless range of seeds all at once
+            seeds = range(next_seed, next_seed + max(count, processes * chunk_size))
+            next_seed = seeds.stop
+            for puzzle in pool.imap(_generate_in_worker, seeds, chunk_size):
+                if count == 0:
+                    break
+                if puzzle is None:
+                    misses += 1
+                    if misses == max_seeds:
+                        raise RuntimeError(str(max_seeds) + " seeds in a row missed " + str(clues) + " clues" +
+                                           (" and the " + difficulty + " band" if difficulty is not None else "") +
+                                           ", try more clues")
+                    continue
+                misses = 0
+                count -= 1
+                yield puzzle
+
+
+def print_explanation_and_terminate():
+    print("USAGE: <count> <output-path|-> [clues] [difficulty=<" + "|".join(DIFFICULTIES) + "|any>] [processes] "
+          "[seed] [block-size]")
+    print("generates puzzles with a unique solution from random full grids on all the cores, and writes one per line "
+          "(stdout for '-') or a corpus file (" + EXTENSION + ", see corpus.py).")
+    print(EASY + ": singles solve it, " + MEDIUM + ": the propagation stage solves it, " + HARD + ": it needs a "
+          "search. default: " + ", ".join(str(clues) + " clues for " + str(block_size ** 2) + "x" + str(block_size ** 2)
+                                          for block_size, clues in DEFAULT_CLUES.items()) + ", any difficulty")
+    print("example: 10000 puzzles.txt 24 hard 8 1")
+    exit(-1)
+
+
+if __name__ == '__main__':
+    args = sys.argv
+    if not 3 <= len(args) <= 8 or (len(args) > 4 and args[4] not in DIFFICULTIES + ('any',)):
+        print_explanation_and_terminate()
+    try:
+        count = int(args[1])
+        clues = int(args[3]) if len(args) > 3 else None
+        processes = int(args[5]) if len(args) > 5 else None
+        seed = int(args[6]) if len(args) > 6 else 0
+        block_size = int(args[7]) if len(args) > 7 else 3
+    except ValueError:
+        print_explanation_and_terminate()
+    difficulty = args[4] if len(args) > 4 and args[4] != 'any' else None
+
+    start = time.time()
+    puzzles = generate(count, block_size, clues, difficulty, processes, seed)
+    try:
+        if args[2].endswith(EXTENSION):
+            write_corpus(args[2], puzzles)
+        else:
+            with (open(args[2], 'w') if args[2] != '-' else sys.stdout) as output_file:
+                for puzzle in puzzles:
+                    output_file.write(puzzle + "\n")
+    except (ValueError, RuntimeError) as error:
+        print(error, file=sys.stderr)
+        exit(-1)
+    total = time.time() - start
+    print("generated", count, "puzzles in", round(total, 3), "seconds,", round(count / total, 1), "puzzles per second",
+          file=sys.stderr)
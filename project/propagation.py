@@ -0,0 +1,184 @@
+from util import EMPTY_VALUE
+
+
+class Contradiction(Exception):
+    """some tile or value in a unit has no place left"""
+    pass
+
+
+class Propagator:
+    """
+    Constraint propagation stage that any solver can run before and during its search.
+    Starting from the solver's legal values it applies, until nothing changes:
+    naked singles, hidden singles, naked pairs, hidden pairs and pointing / box-line reduction.
+    Forced values are put with the solver's insert, so they are in the actions like any other insertion.
+    Eliminations of the pairs and pointing techniques are only kept for the current call.
+    """
+
+    def __init__(self, solver):
+        self.solver = solver
+        self.geometry = solver.geometry
+        self.size = self.geometry.size
+
+    def propagate(self):
+        """
+        returns whether no contradiction was found, and the tiles that were filled (the caller deletes them when it
+        backtracks, see Solver.undo_propagation)
+        """
+        self.placed = []
+        self.masks = [0] * self.geometry.tiles_count
+        self.is_empty = [False] * self.geometry.tiles_count
+        for index, (x, y) in enumerate(self.geometry.tiles):
+            if self.solver.get_value(x, y) == EMPTY_VALUE:
+                self.is_empty[index] = True
+                self.masks[index] = self.solver.candidates.get_mask(x, y)
+
+        techniques = (self.naked_singles, self.hidden_singles, self.naked_pairs, self.hidden_pairs,
+                      self.pointing_and_box_line)
+        try:
+            if not all(self.masks[index] for index in range(self.geometry.tiles_count) if self.is_empty[index]):
+                raise Contradiction()
+            progress = True
+            while progress:
+                # back to the cheapest technique after every change
+                progress = any(technique() for technique in techniques)
+        except Contradiction:
+            return False, self.placed
+
+        return True, self.placed
+
+    def place(self, index, value):
+        x, y = self.geometry.tiles[index]
+        self.solver.insert(x, y, value)
+        self.placed.append((x, y))
+        self.is_empty[index] = False
+        self.masks[index] = 0
+        bit = 1 << (value - 1)
+        for neighbor in self.geometry.peers_indexes[index]:
+            if self.masks[neighbor] & bit:
+                self.eliminate(neighbor, bit)
+
+    def eliminate(self, index, bits):
+        """removes bits from the tile's mask, returns whether something was removed"""
+        if not self.masks[index] & bits:
+            return False
+        self.masks[index] &= ~bits
+        self.solver.stats.prunings += 1
+        if not self.masks[index]:
+            raise Contradiction()
+        return True
+
+    def get_unit_used_values(self, unit_index):
+        """mask of the values already in the unit (units are the rows, then the columns, then the blocks)"""
+        candidates = self.solver.candidates
+        if unit_index < self.size:
+            return candidates.rows[unit_index]
+        if unit_index < 2 * self.size:
+            return candidates.columns[unit_index - self.size]
+        return candidates.blocks[unit_index - 2 * self.size]
+
+    def get_positions(self, unit, bit):
+        return [index for index in unit if self.masks[index] & bit]
+
+    def naked_singles(self):
+        """a tile with a single legal value gets it"""
+        progress = False
+        mask_counts, mask_values = self.solver.candidates.mask_counts, self.solver.candidates.mask_values
+        for index in range(self.geometry.tiles_count):
+            if self.is_empty[index] and mask_counts[self.masks[index]] == 1:
+                self.place(index, mask_values[self.masks[index]][0])
+                progress = True
+        return progress
+
+    def hidden_singles(self):
+        """a value with a single place in a unit goes there"""
+        progress = False
+        candidates = self.solver.candidates
+        for unit_index, unit in enumerate(self.geometry.units_indexes):
+            once = more_than_once = 0
+            for index in unit:
+                more_than_once |= once & self.masks[index]
+                once |= self.masks[index]
+
+            used = self.get_unit_used_values(unit_index)
+            if (once | used) != candidates.full_mask:
+                raise Contradiction()
+
+            for value in candidates.mask_values[once & ~more_than_once & ~used]:
+                bit = 1 << (value - 1)
+                positions = self.get_positions(unit, bit)
+                if not positions:  # lost its place to an earlier placement
+                    raise Contradiction()
+                self.place(positions[0], value)
+                progress = True
+        return progress
+
+    def naked_pairs(self):
+        """two tiles of a unit with the same two legal values take them from the rest of the unit"""
+        progress = False
+        mask_counts = self.solver.candidates.mask_counts
+        for unit in self.geometry.units_indexes:
+            pairs = {}
+            for index in unit:
+                if mask_counts[self.masks[index]] == 2:
+                    pairs.setdefault(self.masks[index], []).append(index)
+
+            for mask, pair in pairs.items():
+                if len(pair) > 2:
+                    raise Contradiction()
+                if len(pair) == 2:
+                    for index in unit:
+                        if index not in pair and self.is_empty[index]:
+                            progress |= self.eliminate(index, mask)
+        return progress
+
+    def hidden_pairs(self):
+        """two values with the same two places in a unit are the only legal values of these places"""
+        progress = False
+        for unit in self.geometry.units_indexes:
+            values_of_positions = {}
+            for value in range(1, self.size + 1):
+                positions = self.get_positions(unit, 1 << (value - 1))
+                if len(positions) == 2:
+                    values_of_positions.setdefault(tuple(positions), []).append(value)
+
+            for positions, values in values_of_positions.items():
+                if len(values) > 2:
+                    raise Contradiction()
+                if len(values) == 2:
+                    mask = (1 << (values[0] - 1)) | (1 << (values[1] - 1))
+                    for index in positions:
+                        progress |= self.eliminate(index, self.masks[index] & ~mask)
+        return progress
+
+    def pointing_and_box_line(self):
+        """
+        pointing: if a value's places in a block share a row/column, the value is removed from the rest of that line.
+        box-line: if a value's places in a row/column share a block, the value is removed from the rest of that block.
+        """
+        progress = False
+        size, units_indexes = self.size, self.geometry.units_indexes
+        for unit_index, unit in enumerate(units_indexes):
+            for value in range(1, size + 1):
+                bit = 1 << (value - 1)
+                positions = self.get_positions(unit, bit)
+                if len(positions) < 2:
+                    continue
+
+                if unit_index >= 2 * size:  # block
+                    rows = {index // size for index in positions}
+                    columns = {index % size for index in positions}
+                    lines = []
+                    if len(rows) == 1:
+                        lines.append(units_indexes[rows.pop()])
+                    if len(columns) == 1:
+                        lines.append(units_indexes[size + columns.pop()])
+                else:
+                    blocks = {self.geometry.get_block_index(*self.geometry.tiles[index]) for index in positions}
+                    lines = [units_indexes[2 * size + blocks.pop()]] if len(blocks) == 1 else []
+
+                for line in lines:
+                    for index in line:
+                        if index not in unit:
+                            progress |= self.eliminate(index, bit)
+        return progress
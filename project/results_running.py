@@ -71,7 +71,7 @@ def simulated_annealing(runs):
             print(flush=True)
 
             results_file.write("    success rate: " + str(successes / runs * 100) + "%" +
-                               " with average time: " + str(round(sum_time / successes, 3)))
+                               " with average time: " + (str(round(sum_time / successes, 3)) if successes else "-"))
             results_file.flush()
 
 
@@ -0,0 +1,67 @@
+from farm import PuzzleFarm, FARM_SOLVER_TYPES, SOLVED, TIMEOUT
+from game import SOLVER_TYPES
+from generator import random_full_grid
+from util import EMPTY_VALUE, grid_to_line
+import random
+import sys
+
+
+BLOCK_SIZES = (3, 4, 5)  # 9x9, 16x16 and 25x25
+EMPTY_RATIO = 0.5  # part of the tiles removed from the full grid
+
+
+def make_puzzle(block_size, empty_ratio, rng):
+    """a puzzle line with empty_ratio of the tiles of a random full grid removed (not checked for uniqueness)"""
+    grid = random_full_grid(block_size, rng)
+    size = len(grid)
+    for index in rng.sample(range(size * size), int(size * size * empty_ratio)):
+        grid[index // size][index % size] = EMPTY_VALUE
+    return grid_to_line(grid)
+
+
+def scaling_benchmark(solver_types, puzzles_count, timeout, seed=0):
+    """
+    solves puzzles_count random puzzles of every size with every solver, each puzzle is given up after timeout
+    seconds. prints and returns the rows of the results
+    """
+    rng = random.Random(seed)
+    puzzles = {block_size: [make_puzzle(block_size, EMPTY_RATIO, rng) for _ in range(puzzles_count)]
+               for block_size in BLOCK_SIZES}
+
+    results = []
+    for block_size in BLOCK_SIZES:
+        size = block_size * block_size
+        print("~size:", str(size) + "x" + str(size), flush=True)
+        for solver_type in solver_types:
+            with PuzzleFarm(SOLVER_TYPES[solver_type], timeout=timeout) as farm:
+                runs = list(farm.solve(puzzles[block_size]))
+            times = sorted(run_time for _, status, run_time in runs if status == SOLVED)
+            solved = len(times)
+            timeouts = sum(status == TIMEOUT for _, status, _ in runs)
+            median = round(times[solved // 2], 3) if times else None
+            results.append((size, solver_type, solved, timeouts, median))
+            print("    -", solver_type, "solved", solved, "of", puzzles_count, "(" + str(timeouts), "timeouts)",
+                  "median time:", median, flush=True)
+    return results
+
+
+def print_explanation_and_terminate():
+    print("USAGE: [puzzles-per-size] [timeout-seconds] [solver=<" + "|".join(FARM_SOLVER_TYPES) + ">...]")
+    print("solves random 9x9, 16x16 and 25x25 puzzles with " + str(int(EMPTY_RATIO * 100)) + "% empty tiles "
+          "with every solver (or the given solvers) on all the cores")
+    print("example: 10 20 csp dancing_links")
+    exit(-1)
+
+
+if __name__ == '__main__':
+    args = sys.argv
+    try:
+        puzzles_count = int(args[1]) if len(args) > 1 else 10
+        timeout = float(args[2]) if len(args) > 2 else 10
+    except ValueError:
+        print_explanation_and_terminate()
+    solver_types = args[3:] or FARM_SOLVER_TYPES
+    if any(solver_type not in FARM_SOLVER_TYPES for solver_type in solver_types):
+        print_explanation_and_terminate()
+
+    scaling_benchmark(solver_types, puzzles_count, timeout)
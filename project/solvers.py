@@ -1,54 +1,265 @@
 import abc
-from random import randint, sample, random
-from util import Action, EMPTY_VALUE
-from collections import deque
+from random import randint, sample, random, getrandbits
+from util import ActionsTrace, EMPTY_VALUE, Geometry, grid_to_line
+from candidates import Candidates
+from propagation import Propagator
+from budget import Budget, CancellationToken, CANCELLED
+from stats import SolverStats
+from itertools import count
 from math import exp
+from multiprocessing import Process, Queue, Event
+import queue
 import sys
 import numpy as np
 
 
 class Solver(object):
-    def __init__(self, game):
+    PHASES = ('solve', 'propagate')  # the methods profile_phases times
+    IS_COMPLETE = True  # whether failing without running out of budget proves the puzzle has no solution
+    COUNTS_SOLUTIONS = True  # whether count_solutions works
+
+    def __init__(self, game, trace=True, propagation=False, budget=None):
+        """
+        with trace=False the actions are only counted and not recorded, for benchmarking
+        with propagation=True the solver runs the constraint propagation stage (see propagation.py)
+        with a budget (see budget.py) the solver stops when it runs out, and get_best_grid gives how far it got
+        """
         super(Solver, self).__init__()
-        self.actions_queue = deque()
+        self.actions_queue = ActionsTrace(trace)
         self.is_solved = False
         self.game = game
         self.grid = game.get_grid().copy()
-        self.read_only_tiles = game.get_read_only()
-        self.full_tiles = self.read_only_tiles.copy()
+        self.geometry = Geometry.of_grid(self.grid)
+        self.size = self.geometry.size  # 9 for a 9x9 grid
+        self.read_only_tiles = game.get_read_only()  # read_only_tiles[y * size + x] is True if (x,y) is read only
+        self.full_tiles = list(self.read_only_tiles)
+        self.candidates = Candidates(self.grid)
+        self.propagator = Propagator(self) if propagation else None
+        self.search_stack = None
+        self.budget = budget if budget is not None else Budget()
+        self.stats = SolverStats(self.budget)
+        self.best_grid = None
+        self.best_progress = -1
+
+    def profile_phases(self):
+        """
+        from now on the time and the calls of every method in PHASES are added to the stats (it slows them down a bit).
+        propagate is left out when the propagation is disabled, it does nothing then
+        """
+        for phase in self.PHASES:
+            if phase == 'propagate' and self.propagator is None:
+                continue
+            setattr(self, phase, self.stats.timed(phase, getattr(self, phase)))
+
+    def set_progress_callback(self, callback):
+        """
+        callback is called with the stats every Budget.CHECK_INTERVAL nodes, to sample the progress of the solve
+        """
+        self.budget.progress_hook = lambda: callback(self.stats)
+
     @abc.abstractmethod
     def solve(self):
         """abstract method, each solver will solve in its way."""
         return
 
+    def count_solutions(self, limit=2):
+        """
+        counts the solutions of the puzzle up to limit: returns 0, 1, ... or limit, which stands for limit solutions
+        or more (with limit=2: 0, 1 or at least 2, whether the puzzle is well formed). None if the budget ran out first.
+        the actions are not recorded. the first solution is found with solve, the next ones by resuming the search,
+        so it needs a solver that didn't solve or count yet (see check_countable)
+        """
+        self.check_countable()
+        self.actions_queue = ActionsTrace(False)
+        self.solve()
+        if not self.is_solved:
+            return None if self.get_stop_reason() is not None else 0
+
+        solutions = 1
+        while solutions < limit:
+            is_found = self.search()
+            if is_found is None:
+                return None
+            if not is_found:
+                break
+            solutions += 1
+        return solutions
+
+    def check_countable(self):
+        """
+        raises TypeError if the solver can't count solutions, and RuntimeError if it already solved or counted: the
+        count would go on from where it stopped
+        """
+        if not self.COUNTS_SOLUTIONS:
+            raise TypeError(type(self).__name__ + " can't count solutions, count with a search solver")
+        if self.is_solved or self.search_stack is not None:
+            raise RuntimeError("the solver already solved or counted, count with a fresh one (see "
+                               "Sudoku.count_solutions)")
+
     def insert(self, x, y, value):
         """
         update insetrion to the grid with the value in coordibate (x,y)
         insert coordinate and value to the queue in order to recreate the actions that led to the solution.
         """
-        if (x, y) in self.read_only_tiles:
+        if self.read_only_tiles[y * self.size + x]:
             print("READ ONLY TILE ON ( ", x, y, ") CAN'T INSERT VALUE", value)
             sys.exit()
         self.grid[y][x] = value
-        self.full_tiles += [(x, y)]
-        self.actions_queue.append((Action(x, y, value)))
+        self.candidates.insert(x, y, value)
+        self.full_tiles[y * self.size + x] = True
+        self.actions_queue.record_insert(x, y, value)
+        self.stats.insertions += 1
 
     def delete(self, x, y):
         """
         update deletion from the grid in the coordibate (x,y)
         delete content from coordinate from the queue in order to recreate the actions that led to the solution.
         """
-        if (x, y) in self.read_only_tiles:
+        if self.read_only_tiles[y * self.size + x]:
             print("READ ONLY TILE ON ( ", x, y, ") CAN'T DELETE")
             sys.exit()
+        self.candidates.delete(x, y, self.grid[y][x])
         self.grid[y][x] = EMPTY_VALUE
-        self.full_tiles.remove((x, y))
-        self.actions_queue.append(Action(x, y))
+        self.full_tiles[y * self.size + x] = False
+        self.actions_queue.record_delete(x, y)
+        self.stats.deletions += 1
 
     def get_value(self, x, y):
         """ get value from coordinate"""
         return self.grid[y][x]
 
+    def get_legal_values(self, x, y):
+        """ get the legal values of coordinate, sorted"""
+        self.stats.legal_values_calls += 1
+        return self.candidates.get_legal_values(x, y)
+
+    def get_legal_values_count(self, x, y):
+        """ get the number of legal values of coordinate"""
+        self.stats.legal_values_calls += 1
+        return self.candidates.get_legal_values_count(x, y)
+
+    def keep_best_grid(self, progress):
+        """
+        keeps a copy of the grid if progress (how far the solver got, like the search depth) is the best so far
+        """
+        if progress > self.best_progress:
+            self.best_progress = progress
+            self.best_grid = self.grid.copy()
+
+    def get_best_grid(self):
+        """
+        the solution if solved, otherwise the most advanced grid the solver reached before it stopped
+        """
+        if self.is_solved or self.best_grid is None:
+            return self.grid
+        return self.best_grid
+
+    def get_stop_reason(self):
+        """None if the solver wasn't stopped by its budget (see budget.py)"""
+        return self.budget.stop_reason
+
+    def propagate(self):
+        """
+        runs the propagation stage, if enabled.
+        returns whether no contradiction was found and the tiles it filled
+        """
+        if self.propagator is None:
+            return True, []
+        return self.propagator.propagate()
+
+    def undo_propagation(self, filled_tiles):
+        for x, y in reversed(filled_tiles):
+            self.delete(x, y)
+
+    def search(self, max_steps=None):
+        """
+        Depth first search with an explicit stack instead of recursion, shared by the search solvers.
+        Each frame is [x, y, the values left to try, what unassign needs to take back the current value (or None)].
+        The solvers choose tiles, values and how to assign them with select_tile, get_ordered_values, assign and
+        unassign.
+        Returns True when solved, False when there is no solution, or None if it paused after max_steps assignments
+        or the budget ran out. Calling it again resumes the search from where it stopped (after a solution, it looks
+        for the next one).
+        """
+        stack = self.search_stack
+        if stack is None:
+            stack = self.search_stack = []
+            x, y = self.select_tile(0, 0)
+            if y == -1:
+                return self.is_search_complete()
+            stack.append([x, y, iter(self.get_ordered_values(x, y)), None])
+
+        steps = 0
+        while stack:
+            if max_steps is not None and steps >= max_steps:
+                return None
+            if self.budget.is_exhausted():
+                return None
+
+            frame = stack[-1]
+            x, y, values, undo = frame
+            if undo is not None:  # the current value didn't lead to a solution
+                self.unassign(x, y, undo)
+                frame[3] = None
+
+            value = next(values, None)
+            if value is None:
+                stack.pop()
+                self.stats.backtracks += 1
+                continue
+
+            frame[3] = self.assign(x, y, value)
+            steps += 1
+            if frame[3] is None:
+                continue
+            if len(stack) > self.best_progress:
+                self.stats.max_depth = len(stack)
+                self.keep_best_grid(len(stack))
+
+            x, y = self.select_tile(x, y)
+            if y == -1:
+                if self.is_search_complete():
+                    return True
+                continue
+            stack.append([x, y, iter(self.get_ordered_values(x, y)), None])
+
+        return False
+
+    def select_tile(self, x, y):
+        """
+        the next tile to fill, after (x,y) was filled. (-1, -1) if there is none.
+        by default the first empty tile from row y on
+        """
+        return self.game.get_first_empty_cell(self.grid, self.read_only_tiles, y)
+
+    def is_search_complete(self):
+        """called when select_tile has no tile, whether the grid is solved"""
+        return True
+
+    def get_ordered_values(self, x, y):
+        """the values to try in (x,y), in order"""
+        return self.get_legal_values(x, y)
+
+    def assign(self, x, y, value):
+        """
+        puts value in (x,y) during the search and propagates it.
+        returns what unassign needs to take it back, or None if it failed (it is already taken back then)
+        """
+        self.insert(x, y, value)
+        return self.propagate_assignment(x, y)
+
+    def propagate_assignment(self, x, y):
+        is_consistent, filled_tiles = self.propagate()
+        if not is_consistent:
+            self.undo_propagation(filled_tiles)
+            self.delete(x, y)
+            return None
+        return filled_tiles
+
+    def unassign(self, x, y, filled_tiles):
+        self.undo_propagation(filled_tiles)
+        self.delete(x, y)
+
 
 class BackTrackingSolver(Solver):
     """
@@ -57,102 +268,112 @@ class BackTrackingSolver(Solver):
     """
 
     def solve(self):
-        if self.__recursive_backtracking():
+        is_consistent, _ = self.propagate()
+        if is_consistent and self.search():
             self.is_solved = True
         return self.actions_queue
 
-    def __recursive_backtracking(self, x=0, y=0):
-        x, y = self.game.get_first_empty_cell(self.grid, self.read_only_tiles, y)
-        if y == -1:
-            return True
-
-        legal_values = self.game.get_legal_values(self.grid, x, y)
-
-        for value in legal_values:
-            self.insert(x, y, value)
-            if self.__recursive_backtracking(x, y):
-                return True
-            self.delete(x, y)
-        return False
-
-
 class CSPSolver(Solver):
     """
     Solves the sudoku with 3 CSP heuristics:
     Minimum Remaining Values, degree heuristics, least constraining value
     """
+    PHASES = Solver.PHASES + ('_get_tile', 'get_ordered_values')
+
     def solve(self):
-        if self.__recursive_csp_backtracking():
+        self.__create_values_count_buckets()
+        is_consistent, _ = self.propagate()
+        if is_consistent and self.search():
             self.is_solved = True
         return self.actions_queue
 
-    def __recursive_csp_backtracking(self, x = 0, y= 0):
-        x, y = self._get_tile()
-        if y == -1 and self.game.is_complete(self.grid):
-            return True
-        elif y == -1:
-            return False
+    def select_tile(self, x, y):
+        return self._get_tile()
 
-        chosen_values = self.__get_least_constraining_values(x, y)
-        for value in chosen_values:
-            self.insert(x, y, value)
-            if self.__recursive_csp_backtracking(x, y):
-                return True
-            self.delete(x, y)
+    def is_search_complete(self):
+        return self.game.is_complete(self.grid)
 
-        return False
+    def get_ordered_values(self, x, y):
+        return self.__get_least_constraining_values(x, y)
+
+    def insert(self, x, y, value):
+        super(CSPSolver, self).insert(x, y, value)
+        self.__update_neighbors_values_count(x, y)
+
+    def delete(self, x, y):
+        super(CSPSolver, self).delete(x, y)
+        self.__update_neighbors_values_count(x, y)
+
+    def __create_values_count_buckets(self):
+        """
+        Minimum Remaining Values index:
+        bucket i holds the indexes (y * size + x) of the empty tiles with exactly i legal values.
+        tile_values_count[index] is the bucket the tile is in, or None if the tile is full.
+        """
+        self.values_count_buckets = [set() for _ in range(self.size + 1)]
+        self.tile_values_count = [None] * self.geometry.tiles_count
+        for y in range(self.size):
+            for x in range(self.size):
+                self.__update_values_count(x, y)
+
+    def __update_values_count(self, x, y):
+        index = y * self.size + x
+        old_values_count = self.tile_values_count[index]
+        values_count = None
+        if self.grid[y, x] == EMPTY_VALUE:
+            values_count = self.get_legal_values_count(x, y)
+        if values_count == old_values_count:
+            return
+
+        if old_values_count is not None:
+            self.values_count_buckets[old_values_count].discard(index)
+        if values_count is not None:
+            self.values_count_buckets[values_count].add(index)
+        self.tile_values_count[index] = values_count
+
+    def __update_neighbors_values_count(self, x, y):
+        """only the tile and its neighbors legal values might change after an insertion/deletion"""
+        self.__update_values_count(x, y)
+        for x_neighbor, y_neighbor in self.geometry.peers[y][x]:
+            self.__update_values_count(x_neighbor, y_neighbor)
 
     def _get_tile(self):
         """
         Returns the tile that satisfies Minimum Remaining Values, degree heuristics
         If no tile found with some legal values it will return -1, -1
+        Ties are broken by the order of the tiles (row by row).
         """
 
-        min_values_count_tiles = []
-        min_values_count = np.inf
-
         '''
         Minimum Remaining Values - tiles with least legal values.
         '''
-        for y in range(0,9):
-            for x in range(0,9):
-                if (x, y) not in self.read_only_tiles and\
-                        self.get_value(x, y) == EMPTY_VALUE:
-                    values_count = len(self.game.get_legal_values(self.grid, x, y))
-                    if values_count == 1: # just one possible value. go for it
-                        return x,y
-                    if 0 < values_count < min_values_count:
-                        min_values_count_tiles = [(x,y)] # reset the array and add (x,y)
-                        min_values_count = values_count
-                    elif values_count == min_values_count:
-                        min_values_count_tiles += [(x, y)] # just add (x,y)
-
-        if len(min_values_count_tiles) == 0:
-            return -1, -1
+        if self.values_count_buckets[1]:  # just one possible value. go for it
+            index = min(self.values_count_buckets[1])
+            return index % self.size, index // self.size
+
+        min_values_count_tiles = None
+        for values_count in range(2, self.size + 1):
+            if self.values_count_buckets[values_count]:
+                min_values_count_tiles = self.values_count_buckets[values_count]
+                break
 
-        if len(min_values_count_tiles) == 1:
-            return min_values_count_tiles[0]
+        if not min_values_count_tiles:
+            return -1, -1
 
         '''
         for the tiles from the previous heuristic:
         Degree Heuristic - tiles with least empty neighbors (row, col, block)
         '''
+        index = max(sorted(min_values_count_tiles), key=self.__full_neighbors_count)
+        return index % self.size, index // self.size
 
-        max_full_neighbors_count_tiles = []
-        max_full_neighbors_count = -np.inf
-        for (x, y) in min_values_count_tiles:
-            row, col, block = self.game.get_row(self.grid, x), \
-                              self.game.get_column(self.grid, y), \
-                              self.game.get_block(self.grid, x, y)
-
-            full_neighbors_count = np.count_nonzero(row) + np.count_nonzero(col) + np.count_nonzero(block)
-            if full_neighbors_count > max_full_neighbors_count:
-                max_full_neighbors_count_tiles = [(x,y)]
-                max_full_neighbors_count = full_neighbors_count
-            elif full_neighbors_count == max_full_neighbors_count:
-                max_full_neighbors_count_tiles += [(x, y)]
-
-        return max_full_neighbors_count_tiles[0]
+    def __full_neighbors_count(self, index):
+        x, y = index % self.size, index // self.size
+        mask_counts = self.candidates.mask_counts
+        # full tiles are counted on row x and column y, as it was always done
+        return mask_counts[self.candidates.rows[x]] + \
+               mask_counts[self.candidates.columns[y]] + \
+               mask_counts[self.candidates.blocks[self.geometry.get_block_index(x, y)]]
 
     def __get_least_constraining_values(self, x, y):
         """
@@ -160,7 +381,7 @@ class CSPSolver(Solver):
         Go through every neighbor the the chosen tile, and check how many possibilities all the neighbor have,
         and choose the value that gives the neighbors the most possibilities.
         """
-        legal_values = np.ndarray.tolist(self.game.get_legal_values(self.grid, x, y))
+        legal_values = list(self.get_legal_values(x, y))
 
         legal_values.sort(key=lambda value: -self._neighbor_legal_values_count(x,y, value))
 
@@ -169,16 +390,22 @@ class CSPSolver(Solver):
     def _neighbor_legal_values_count(self, x, y, value):
         """Get the number of possible values for all the neighbor for the given value"""
         values_count = 0
-        self.insert(x, y, value)
-        for x_neighbor, y_neighbor in self.game.get_neighbors(x, y):
+        # the value is removed right after, so the Minimum Remaining Values index is not updated
+        super(CSPSolver, self).insert(x, y, value)
+        block_size = self.geometry.block_size
+        for x_neighbor, y_neighbor in self.geometry.peers[y][x]:
             if self.get_value(x_neighbor, y_neighbor) == EMPTY_VALUE:
-                neighbor_legal_values_count = len(self.game.get_legal_values(self.grid, x_neighbor, y_neighbor))
+                neighbor_legal_values_count = self.get_legal_values_count(x_neighbor, y_neighbor)
                 if neighbor_legal_values_count == 0:
                     values_count = -np.inf  # no way to chose it
                     break
+                # the row, column and block are summed separately, so block neighbors in the row/column count twice
+                if (x_neighbor == x or y_neighbor == y) and \
+                        x_neighbor // block_size == x // block_size and y_neighbor // block_size == y // block_size:
+                    neighbor_legal_values_count *= 2
                 values_count += neighbor_legal_values_count
 
-        self.delete(x, y)
+        super(CSPSolver, self).delete(x, y)
 
         return values_count
 
@@ -190,34 +417,20 @@ class ForwardCheckingSolver(Solver):
     """
 
     def solve(self):
-        if self.__recursive_backtracking_with_fc():
+        is_consistent, _ = self.propagate()
+        if is_consistent and self.search():
             self.is_solved = True
         return self.actions_queue
 
-    def __recursive_backtracking_with_fc(self, x=0, y=0):
-        x, y = self.game.get_first_empty_cell(self.grid, self.read_only_tiles, y)
-        if y == -1:
-            return True
-
-        legal_values = self.game.get_legal_values(self.grid, x, y)
-
-        for value in legal_values:
-            self.insert(x, y, value)
-            is_value_possible = True
-            for nx, ny in self.game.get_neighbors(x, y):
-                if self.get_value(nx, ny) == EMPTY_VALUE:
-                    if len(self.game.get_legal_values(self.grid, nx, ny)) == 0:
-                        is_value_possible = False
-                        break
-
-            if not is_value_possible:
-                self.delete(x, y)
-                continue
+    def assign(self, x, y, value):
+        self.insert(x, y, value)
+        for nx, ny in self.geometry.peers[y][x]:
+            if self.get_value(nx, ny) == EMPTY_VALUE:
+                if self.get_legal_values_count(nx, ny) == 0:
+                    self.delete(x, y)
+                    return None
 
-            if self.__recursive_backtracking_with_fc(x, y):
-                return True
-            self.delete(x, y)
-        return False
+        return self.propagate_assignment(x, y)
 
 
 class SimulatedAnnealingSolver(Solver):
@@ -228,27 +441,67 @@ class SimulatedAnnealingSolver(Solver):
     Might not switch between them with some probability streaming to zero.
     If stuck on local maximum for long time (depending on the value of the maximum) it shuffles some random amount of
     columns and continues
+    The score of the grid is kept up to date with counts of every value in every row and block, so the score of a switch
+    is computed from the counts of the two tiles' rows and blocks, without copying or rescoring the grid.
     """
+    PHASES = Solver.PHASES + ('random_fill', 'randomize')
+    IS_COMPLETE = False  # a local search that gives up proves nothing
+    COUNTS_SOLUTIONS = False  # a local search never finds that there is no other solution
+
+    def __init__(self, game, trace=True, propagation=False, budget=None):
+        super(SimulatedAnnealingSolver, self).__init__(game, trace, propagation, budget)
+        self.solved_score = 2 * self.size * self.size  # every row and block has all the values (162 in a 9x9 grid)
+        self.row_counts = [[0] * (self.size + 1) for _ in range(self.size)]
+        self.block_counts = [[0] * (self.size + 1) for _ in range(self.size)]
+        self.current_score = 0  # the score of self.grid
+        for y in range(self.size):
+            for x in range(self.size):
+                if self.get_value(x, y) != EMPTY_VALUE:
+                    self.__count_value(x, y, self.get_value(x, y), 1)
+
+    def insert(self, x, y, value):
+        super(SimulatedAnnealingSolver, self).insert(x, y, value)
+        self.__count_value(x, y, value, 1)
+
+    def delete(self, x, y):
+        value = self.get_value(x, y)
+        super(SimulatedAnnealingSolver, self).delete(x, y)
+        self.__count_value(x, y, value, -1)
+
+    def __count_value(self, x, y, value, change):
+        """updates the counts of value in the row and block of (x,y), and the score with them"""
+        for counts in (self.row_counts[y], self.block_counts[self.geometry.get_block_index(x, y)]):
+            if counts[value] == 0:
+                self.current_score += 1
+            counts[value] += change
+            if counts[value] == 0:
+                self.current_score -= 1
 
     def solve(self):
-        self.MAX_ITERATIONS = 30000
+        # without time or nodes limits it gives up after MAX_ITERATIONS (a cancellation token alone may never come),
+        # with them it runs until solved or out of budget
+        self.MAX_ITERATIONS = 30000 if self.budget.time_limit is None and self.budget.max_nodes is None else None
+        self.propagate()  # the tiles it fills are switched like the rest
         self.is_solved = self.do_simulated_annealing()
         return self.actions_queue
 
     def do_simulated_annealing(self):
         self.random_fill()
-        curr_score = self.score(self.grid)
-        if curr_score == 162: # you can never know
+        curr_score = self.current_score
+        if curr_score == self.solved_score: # you can never know
             return True
 
         temperature = 1
         stuck_count = 0
         best_score = curr_score
-        for i in range(self.MAX_ITERATIONS):
-            successor, tile1, tile2 = self.switch_neighbors()
-            successor_score = self.score(successor)
-
-            if successor_score == 162:
+        self.keep_best_grid(curr_score)
+        for i in self.get_iterations():
+            if self.budget.is_exhausted():
+                break
+            tile1, tile2 = self.get_random_neighbors()
+            successor_score = self.current_score + self.get_switch_delta(tile1, tile2)
+
+            if successor_score == self.solved_score:
                 self.switch_tiles(tile1, tile2)
                 return True
 
@@ -268,76 +521,70 @@ class SimulatedAnnealingSolver(Solver):
             if best_score < curr_score:
                 stuck_count = 0
                 best_score = curr_score
+                if curr_score > self.best_progress:
+                    self.keep_best_grid(curr_score)
             else:
-                if stuck_count > 2000 + 3000//(162 - best_score):  # we've been same score for a long time
+                if stuck_count > 2000 + 3000//(self.solved_score - best_score):  # we've been same score for a long time
 
                     self.randomize()
 
                     stuck_count = 0
-                    curr_score = self.score(self.grid)
+                    curr_score = self.current_score
                     best_score = curr_score
 
             temperature *= .999
         return False
 
+    def get_iterations(self):
+        return range(self.MAX_ITERATIONS) if self.MAX_ITERATIONS is not None else count()
+
     def random_fill(self):
         """
         initial random filling for the board where legality only takes place in columns.
         """
-        for x in range(9):
-            possible_values = np.setdiff1d(np.array([value for value in range(1, 10)]),
-                                           self.game.get_column(self.grid, x))
-            for y in range(9):
+        for x in range(self.size):
+            possible_values = list(self.candidates.get_column_free_values(x))
+            for y in range(self.size):
                 if self.get_value(x,y) == EMPTY_VALUE: # or else it is read only
                     rand_index = randint(0, len(possible_values) - 1)
                     self.insert(x, y, possible_values[rand_index])
-                    possible_values = np.delete(possible_values, rand_index)
-
-    def score(self, grid):
-        """
-        score function for a given board. calculates the number of different values in each column, row and block and
-        sums them.
-        """
-        score = 0
-        for i in range(9):
-            score += len(set(self.game.get_row(grid, i)))
-            #score += len(set(self.game.get_column(grid, i)))
-
-        for y in [0, 3, 6]:
-            for x in [0, 3, 6]:
-                score += len(set(self.game.get_block(grid, x, y)))
-
-        return score
+                    possible_values.pop(rand_index)
 
     def get_random_neighbors(self):
         """
         finds two tiles from the same column which are not for read only
         :return:
         """
-        x = randint(0, 8)
-        y1 = randint(0, 8)
-        y2 = randint(0, 8)
-        while y1 == y2 or (x, y1) in self.read_only_tiles or (x, y2) in self.read_only_tiles:
-            x = randint(0, 8)
-            y1 = randint(0, 8)
-            y2 = randint(0, 8)
+        last = self.size - 1
+        x = randint(0, last)
+        y1 = randint(0, last)
+        y2 = randint(0, last)
+        while y1 == y2 or self.read_only_tiles[y1 * self.size + x] or self.read_only_tiles[y2 * self.size + x]:
+            x = randint(0, last)
+            y1 = randint(0, last)
+            y2 = randint(0, last)
 
         return (x, y1), (x, y2)
 
-    def switch_neighbors(self):
+    def get_switch_delta(self, t1, t2):
         """
-        finds two random neighbors, switches their values and return the neighbors and the new board.
+        returns how much the score would change by switching the values of two tiles from the same column.
+        the first tile's row and block lose its value and gain the second's, and the other way around.
         """
-        next_grid = self.grid.copy()
-
-        (x1, y1), (x2, y2) = self.get_random_neighbors()
-        value1 = self.get_value(x1, y1)
-        value2 = self.get_value(x2, y2)
-
-        next_grid[y1][x1] = value2
-        next_grid[y2][x2] = value1
+        x1, y1 = t1
+        x2, y2 = t2
+        v1 = self.get_value(x1, y1)
+        v2 = self.get_value(x2, y2)
+        if v1 == v2:
+            return 0
 
-        return next_grid, (x1, y1), (x2, y2)
+        delta = 0
+        for counts1, counts2 in ((self.row_counts[y1], self.row_counts[y2]),
+                                 (self.block_counts[self.geometry.get_block_index(x1, y1)],
+                                  self.block_counts[self.geometry.get_block_index(x2, y2)])):
+            if counts1 is not counts2:  # the same block doesn't change
+                delta += (counts1[v2] == 0) - (counts1[v1] == 1) + (counts2[v1] == 0) - (counts2[v2] == 1)
+        return delta
 
     def switch_tiles(self, t1, t2):
         x1, y1 = t1
@@ -355,121 +602,505 @@ class SimulatedAnnealingSolver(Solver):
         """
         selects some columns and shuffles them
         """
-        columns_to_shuffle = sample(range(0, 9), randint(1, 9))
+        columns_to_shuffle = sample(range(0, self.size), randint(1, self.size))
 
         for x in columns_to_shuffle:
-            for y in range(0, 9):
-                if (x, y) not in self.read_only_tiles:
+            for y in range(0, self.size):
+                if not self.read_only_tiles[y * self.size + x]:
                     self.delete(x, y)
 
         for x in columns_to_shuffle:
-            possible_values = np.setdiff1d(np.array([value for value in range(1, 10)]),
-                                           self.game.get_column(self.grid, x))
-            for y in range(0, 9):
+            possible_values = list(self.candidates.get_column_free_values(x))
+            for y in range(0, self.size):
                 if self.get_value(x,y) == 0: # or else it is read only and we don't mess with it
                     rand_index = randint(0, len(possible_values) - 1)
                     self.insert(x, y, possible_values[rand_index])
-                    possible_values = np.delete(possible_values, rand_index)
+                    possible_values.pop(rand_index)
+
+
+class MultiChainSimulatedAnnealingSolver(SimulatedAnnealingSolver):
+    """
+    Runs CHAINS independent simulated annealing chains in lockstep, as one (CHAINS, size, size) array.
+    Every iteration each chain proposes a switch of two tiles from the same column, the switches are scored with the
+    value counts of all the chains at once and accepted with the Metropolis rule.
+    A chain that didn't improve for STUCK_ITERATIONS is filled randomly again.
+    Stops as soon as any chain is solved, and replays that chain's tiles as the actions.
+    """
+    CHAINS = 64
+    STUCK_ITERATIONS = 2000
+    PHASES = Solver.PHASES
+
+    def do_simulated_annealing(self):
+        self.rng = np.random.default_rng(getrandbits(64))  # seeded from random, like the other solvers
+        size = self.size
+        chains = np.arange(self.CHAINS)
+        self.tile_block = np.array([[self.geometry.get_block_index(x, y) for x in range(size)] for y in range(size)])
+        self.free_tiles = self.grid == EMPTY_VALUE
+        switches = np.array([(x, y1, y2) for x in range(size) for y1 in range(size) for y2 in range(size)
+                             if y1 != y2 and self.free_tiles[y1, x] and self.free_tiles[y2, x]], dtype=int)
+
+        self.chain_grids = np.repeat(self.grid[None], self.CHAINS, axis=0)
+        self.chain_row_counts = np.zeros((self.CHAINS, size, size + 1), dtype=int)
+        self.chain_block_counts = np.zeros((self.CHAINS, size, size + 1), dtype=int)
+        self.chain_scores = np.zeros(self.CHAINS, dtype=int)
+        self.__random_fill(chains)
+
+        temperatures = np.ones(self.CHAINS)
+        best_scores = self.chain_scores.copy()
+        stuck_counts = np.zeros(self.CHAINS, dtype=int)
+        for i in self.get_iterations():
+            solved_chains = np.flatnonzero(self.chain_scores == self.solved_score)
+            if len(solved_chains) or len(switches) == 0 or self.budget.is_exhausted():
+                break
+
+            x, y1, y2 = switches[self.rng.integers(len(switches), size=self.CHAINS)].T
+            v1 = self.chain_grids[chains, y1, x]
+            v2 = self.chain_grids[chains, y2, x]
+            b1 = self.tile_block[y1, x]
+            b2 = self.tile_block[y2, x]
+
+            delta = self.__switch_delta(self.chain_row_counts, chains, y1, y2, v1, v2) + \
+                    (b1 != b2) * self.__switch_delta(self.chain_block_counts, chains, b1, b2, v1, v2)
+            delta *= v1 != v2
+            # the improving moves are accepted anyway, so their exp is capped at 1 instead of overflowing
+            accepted = (delta >= 0) | (self.rng.random(self.CHAINS) < np.exp(np.minimum(delta / temperatures, 0)))
+
+            k, x, y1, y2, v1, v2, b1, b2 = (a[accepted] for a in (chains, x, y1, y2, v1, v2, b1, b2))
+            self.chain_grids[k, y1, x] = v2
+            self.chain_grids[k, y2, x] = v1
+            for counts, unit1, unit2 in ((self.chain_row_counts, y1, y2), (self.chain_block_counts, b1, b2)):
+                counts[k, unit1, v1] -= 1
+                counts[k, unit1, v2] += 1
+                counts[k, unit2, v2] -= 1
+                counts[k, unit2, v1] += 1
+            self.chain_scores += delta * accepted
+
+            temperatures *= .999
+            improved = self.chain_scores > best_scores
+            best_scores = np.maximum(best_scores, self.chain_scores)
+            stuck_counts = np.where(improved, 0, stuck_counts + 1)
+            stuck_chains = np.flatnonzero(stuck_counts > self.STUCK_ITERATIONS)
+            if len(stuck_chains):
+                self.__random_fill(stuck_chains)
+                temperatures[stuck_chains] = 1
+                best_scores[stuck_chains] = self.chain_scores[stuck_chains]
+                stuck_counts[stuck_chains] = 0
+
+        best_chain = int(np.argmax(self.chain_scores))
+        for y in range(size):
+            for x in range(size):
+                if self.free_tiles[y, x]:
+                    self.insert(x, y, self.chain_grids[best_chain, y, x])
+        self.keep_best_grid(self.chain_scores[best_chain])
+
+        return self.chain_scores[best_chain] == self.solved_score
+
+    @staticmethod
+    def __switch_delta(counts, chains, unit1, unit2, v1, v2):
+        """
+        the score change of every chain when unit1 loses v1 and gains v2, and unit2 loses v2 and gains v1
+        """
+        return (counts[chains, unit1, v2] == 0).astype(int) - (counts[chains, unit1, v1] == 1) + \
+               (counts[chains, unit2, v1] == 0) - (counts[chains, unit2, v2] == 1)
+
+    def __random_fill(self, chains):
+        """
+        fills the free tiles of the given chains randomly, where legality only takes place in columns,
+        and recounts their values and scores
+        """
+        size = self.size
+        for x in range(size):
+            free_rows = np.flatnonzero(self.free_tiles[:, x])
+            values = np.setdiff1d(np.arange(1, size + 1), self.grid[:, x])
+            self.chain_grids[chains[:, None], free_rows[None, :], x] = \
+                self.rng.permuted(np.tile(values, (len(chains), 1)), axis=1)
+
+        grids = self.chain_grids[chains]
+        chain_indexes = np.arange(len(chains))[:, None, None]
+        row_counts = np.zeros((len(chains), size, size + 1), dtype=int)
+        block_counts = np.zeros((len(chains), size, size + 1), dtype=int)
+        np.add.at(row_counts, (chain_indexes, np.arange(size)[None, :, None], grids), 1)
+        np.add.at(block_counts, (chain_indexes, self.tile_block[None], grids), 1)
+        self.chain_row_counts[chains] = row_counts
+        self.chain_block_counts[chains] = block_counts
+        self.chain_scores[chains] = np.count_nonzero(row_counts[:, :, 1:], axis=(1, 2)) + \
+                              np.count_nonzero(block_counts[:, :, 1:], axis=(1, 2))
 
 
 class ArcConsistencySolver(Solver):
-    def solve(self):
-        self.create_domains_matrix()
-        self.create_arcs_queue()
-        self.domains_reduction()
+    """
+    Backtracking that maintains arc consistency (MAC).
+    Every tile has a domain, kept as a size-bits mask (bit i stands for value i + 1).
+    Before the search and after every assignment the domains are reduced with AC-3: the only arc (x1,y1) -> (x2,y2)
+    that can remove values is one where (x2,y2) has a single value, so the queue holds the tiles whose domains changed
+    and the arcs from all their neighbors to them are revised.
+    Every domain change is pushed to a trail, so backtracking restores the domains by popping only what was changed.
+    """
+    PHASES = Solver.PHASES + ('create_domains', 'domains_reduction')
 
-        if self.__recursive_backtracking():
+    def solve(self):
+        is_consistent, _ = self.propagate()  # only before the search, it maintains arc consistency on its own
+        self.create_domains()
+        self.trail = []
+        if is_consistent and self.domains_reduction(list(range(self.geometry.tiles_count))) and self.search():
             self.is_solved = True
         return self.actions_queue
 
-    def __recursive_backtracking(self, x=0, y=0):
-        x, y = self.game.get_first_empty_cell(self.grid, self.read_only_tiles, y)
-        if y == -1:
-            return True
+    def get_ordered_values(self, x, y):
+        return self.candidates.mask_values[self.domains[y * self.size + x]]
 
-        legal_values = np.intersect1d(self.domain_matrix[y][x], self.game.get_legal_values(self.grid, x, y))
+    def assign(self, x, y, value):
+        index = y * self.size + x
+        trail_length = len(self.trail)
+        self.set_domain(index, 1 << (value - 1))
+        if not self.domains_reduction([index]):
+            self.undo(trail_length)
+            return None
+        self.insert(x, y, value)
+        return trail_length
 
-        for value in legal_values:
-            self.insert(x, y, value)
-            if self.__recursive_backtracking(x, y):
-                return True
-            self.delete(x, y)
-        return False
+    def unassign(self, x, y, trail_length):
+        self.delete(x, y)
+        self.undo(trail_length)
 
-    def create_domains_matrix(self):
+    def create_domains(self):
         '''
-        create an 9x9 matrix where each entry (x,y) holds the domain of the (x,y) tile
+        create a list where entry y * size + x holds the domain mask of the (x,y) tile
         '''
-        self.domain_matrix = np.empty((9,9), dtype=object)
-
-        for y in range(9):
-            for x in range(9):
+        self.domains = [0] * self.geometry.tiles_count
+        for y in range(self.size):
+            for x in range(self.size):
                 if self.get_value(x, y) == EMPTY_VALUE:
-                    self.domain_matrix[y][x] = self.game.get_legal_values(self.grid, x, y)
+                    self.domains[y * self.size + x] = self.candidates.get_mask(x, y)
                 else:
-                    self.domain_matrix[y][x] = np.array([self.get_value(x,y)])
+                    self.domains[y * self.size + x] = 1 << (self.get_value(x, y) - 1)
 
-    def create_arcs_queue(self):
+    def set_domain(self, index, domain):
+        self.trail.append((index, self.domains[index]))
+        self.domains[index] = domain
+
+    def undo(self, trail_length):
         '''
-        creates a queue of pairs of neighbors ((x1,y1),(x2,y2)) of the matrix
-        :return:
+        restores the domains to how they were when the trail had trail_length changes
         '''
-        self.arcs_queue = set()
-        for y in range(9):
-            for x in range(9):
-
-                if self.get_value(x, y) == EMPTY_VALUE:
-                    for neighbor in self.game.get_neighbors_indexes(x, y):
-                        self.arcs_queue.add(((x,y), neighbor))
+        while len(self.trail) > trail_length:
+            index, domain = self.trail.pop()
+            self.domains[index] = domain
 
-    def domains_reduction(self):
-        while self.arcs_queue:
-            pair = self.arcs_queue.pop()
-            if self.remove_inconsistent_values(pair):
-                if pair[1] not in self.read_only_tiles:
-                    for neighbor in self.game.get_neighbors_indexes(pair[1][0], pair[1][1]):
-                        self.arcs_queue.add((pair[1], neighbor))
+    def domains_reduction(self, queue):
+        '''
+        AC-3 from the tiles in queue. returns False if some domain became empty
+        '''
+        domains = self.domains
+        mask_counts, peers_indexes = self.candidates.mask_counts, self.geometry.peers_indexes
+        while queue:
+            index = queue.pop()
+            value_mask = domains[index]
+            if mask_counts[value_mask] != 1:  # every value has support in a domain with more than one value
+                continue
+            for neighbor in peers_indexes[index]:
+                if domains[neighbor] & value_mask:
+                    domain = domains[neighbor] & ~value_mask
+                    if not domain:
+                        return False
+                    self.set_domain(neighbor, domain)
+                    self.stats.prunings += 1
+                    if mask_counts[domain] == 1:
+                        queue.append(neighbor)
+        return True
+
+
+class DancingLinksSolver(Solver):
+    """
+    Solves the sudoku as an exact cover problem with Knuth's Algorithm X, using dancing links.
+    Every empty tile and legal value is a row of the cover matrix, covering 4 constraints (columns):
+    the tile is full, the value is in the tile's row, in the tile's column and in the tile's block.
+    Constraints already satisfied by the read only tiles are left out of the matrix.
+    The links are kept in flat lists indexed by node, node 0 is the root and the column headers come right after it.
+    """
+    ROOT = 0
+    PHASES = Solver.PHASES + ('create_links',)
 
-    def remove_inconsistent_values(self, pair):
-        (x1, y1), (x2, y2) = pair[0], pair[1]
+    def solve(self):
+        is_consistent, _ = self.propagate()  # only before the search, the links are built from the grid
+        self.create_links()
+        if is_consistent and self.__search():
+            self.is_solved = True
+        return self.actions_queue
 
-        if len(self.domain_matrix[y2][x2]) != 1:
+    def count_solutions(self, limit=2):
+        """like Solver.count_solutions, with Algorithm X going on after every solution instead of stopping"""
+        self.check_countable()
+        self.actions_queue = ActionsTrace(False)
+        is_consistent, _ = self.propagate()
+        if not is_consistent:
+            return 0
+        self.create_links()
+        solutions = self.__count(limit)
+        return None if self.get_stop_reason() is not None else solutions
+
+    def __count(self, limit):
+        """the number of covers found, up to limit. the grid isn't filled, only the links are covered"""
+        if self.right[self.ROOT] == self.ROOT:
+            return 1
+        if self.budget.is_exhausted():
+            return 0
+
+        right, size = self.right, self.column_size
+        column = right[self.ROOT]
+        node = right[column]
+        while node != self.ROOT and size[column] > 1:
+            if size[node] < size[column]:
+                column = node
+            node = right[node]
+        if size[column] == 0:
+            return 0
+
+        solutions = 0
+        self.__cover(column)
+        row = self.down[column]
+        while row != column and solutions < limit:
+            node = self.right[row]
+            while node != row:
+                self.__cover(self.column[node])
+                node = self.right[node]
+
+            solutions += self.__count(limit - solutions)
+
+            node = self.left[row]
+            while node != row:
+                self.__uncover(self.column[node])
+                node = self.left[node]
+            row = self.down[row]
+        self.__uncover(column)
+
+        return solutions
+
+    def get_constraints(self, x, y, value):
+        """the 4 constraints covered by putting value in tile (x,y), each kind takes tiles_count ids"""
+        size, tiles_count = self.size, self.geometry.tiles_count
+        return (y * size + x,
+                tiles_count + y * size + value - 1,
+                2 * tiles_count + x * size + value - 1,
+                3 * tiles_count + self.geometry.get_block_index(x, y) * size + value - 1)
+
+    def create_links(self):
+        satisfied = set()
+        for y in range(self.size):
+            for x in range(self.size):
+                if self.get_value(x, y) != EMPTY_VALUE:
+                    satisfied.update(self.get_constraints(x, y, self.get_value(x, y)))
+
+        self.left, self.right, self.up, self.down = [0], [0], [0], [0]
+        self.column, self.column_size = [0], [0]
+        self.node_tile = [None]  # the (x, y, value) of every node's row
+
+        headers = {}
+        for constraint in range(4 * self.geometry.tiles_count):
+            if constraint not in satisfied:
+                headers[constraint] = self.__add_node(len(self.left), None)
+                self.__link_horizontally(self.left[self.ROOT], headers[constraint])
+
+        for y in range(self.size):
+            for x in range(self.size):
+                if self.get_value(x, y) != EMPTY_VALUE:
+                    continue
+                for value in self.get_legal_values(x, y):
+                    first = None
+                    for constraint in self.get_constraints(x, y, value):
+                        node = self.__add_node(headers[constraint], (x, y, value))
+                        if first is None:
+                            first = node
+                        else:
+                            self.__link_horizontally(self.left[first], node)
+
+    def __add_node(self, column, tile):
+        """appends a node at the bottom of column. a header is a node which is its own column"""
+        node = len(self.left)
+        self.left.append(node)
+        self.right.append(node)
+        self.up.append(node)
+        self.down.append(node)
+        self.column.append(column)
+        self.column_size.append(0)
+        self.node_tile.append(tile)
+        if column != node:
+            self.up[node] = self.up[column]
+            self.down[node] = column
+            self.down[self.up[column]] = node
+            self.up[column] = node
+            self.column_size[column] += 1
+        return node
+
+    def __link_horizontally(self, left_node, node):
+        """links node right after left_node"""
+        self.right[node] = self.right[left_node]
+        self.left[node] = left_node
+        self.left[self.right[left_node]] = node
+        self.right[left_node] = node
+
+    def __cover(self, column):
+        left, right, up, down, node_column, size = self.left, self.right, self.up, self.down, self.column, \
+            self.column_size
+        right[left[column]] = right[column]
+        left[right[column]] = left[column]
+        i = down[column]
+        while i != column:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[node_column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def __uncover(self, column):
+        left, right, up, down, node_column, size = self.left, self.right, self.up, self.down, self.column, \
+            self.column_size
+        i = up[column]
+        while i != column:
+            j = left[i]
+            while j != i:
+                size[node_column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[column]] = column
+        left[right[column]] = column
+
+    def __search(self, depth=0):
+        if self.right[self.ROOT] == self.ROOT:  # every constraint is covered
+            return True
+        if self.budget.is_exhausted():
+            return False
+        if depth > self.best_progress:
+            self.stats.max_depth = depth
+            self.keep_best_grid(depth)
+
+        # the column with the least rows, like Minimum Remaining Values
+        right, size = self.right, self.column_size
+        column = right[self.ROOT]
+        node = right[column]
+        while node != self.ROOT and size[column] > 1:  # can't do better than a forced move
+            if size[node] < size[column]:
+                column = node
+            node = right[node]
+        if size[column] == 0:
             return False
 
-        removed = False
-        for value1 in self.domain_matrix[y1][x1]:
-            if self.domain_matrix[y2][x2][0] == value1:
-                # delete value1 from [x1, y1]
-                self.domain_matrix[y1][x1] = np.delete(self.domain_matrix[y1][x1],
-                                                       np.argwhere(self.domain_matrix[y1][x1] == value1))
-
-                removed = True
-
-        return removed
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        self.__cover(column)
+        row = self.down[column]
+        while row != column:
+            node = self.right[row]
+            while node != row:
+                self.__cover(self.column[node])
+                node = self.right[node]
 
+            x, y, value = self.node_tile[row]
+            self.insert(x, y, value)
+            if self.__search(depth + 1):
+                return True
+            self.delete(x, y)
+            self.stats.backtracks += 1
 
+            node = self.left[row]
+            while node != row:
+                self.__uncover(self.column[node])
+                node = self.left[node]
+            row = self.down[row]
+        self.__uncover(column)
 
+        return False
 
 
+def _run_portfolio_solver(game_class, puzzle, solver_type, trace, propagation, time_limit, max_nodes, cancel_event,
+                          results):
+    """
+    runs one solver of a portfolio in its own process, on a game built from the puzzle line.
+    puts (solver type, is solved, best grid, actions if solved, stop reason, nodes, whether it proved there is no
+    solution) in results
+    """
+    budget = Budget(time_limit, max_nodes, CancellationToken(cancel_event))
+    solver = game_class(None, solver_type, puzzle=puzzle, trace=trace, propagation=propagation,
+                        budget=budget).get_solver()
+    solver.solve()
+    is_solved = solver.is_solved and game_class.is_complete(solver.grid)
+    has_no_solution = not is_solved and budget.stop_reason is None and solver.IS_COMPLETE
+    results.put((solver_type, is_solved, solver.get_best_grid(), solver.actions_queue if is_solved else None,
+                 budget.stop_reason, budget.nodes, has_no_solution))
 
 
+class PortfolioSolver(Solver):
+    """
+    Races several solvers on the same puzzle, each in its own process.
+    The first solution that is verified (complete, and keeps the read only tiles) wins: its grid and actions become
+    this solver's, and the other solvers are cancelled through a shared cancellation token (see budget.py).
+    Every solver gets this solver's time and nodes limits. If none solves it, the best grid is the one with the most
+    full tiles.
+    A search solver (IS_COMPLETE) that fails before its budget runs out proves there is no solution, so the race
+    stops there too.
+    The processes are started from a process of its own, so it can't run inside daemonic workers (like farm.py's).
+    """
+    POLL_INTERVAL = 0.05  # seconds between checks of this solver's own cancellation token
+    COUNTS_SOLUTIONS = False  # it races for the first solution
+    JOIN_TIMEOUT = 1  # seconds a cancelled solver has to stop before it is terminated
 
+    def __init__(self, game, trace=True, propagation=False, budget=None, solver_types=()):
+        super(PortfolioSolver, self).__init__(game, trace, propagation, budget)
+        self.trace = trace
+        self.propagation = propagation
+        self.solver_types = solver_types
+        self.winner = None  # the type of the solver that solved it first
 
+    def solve(self):
+        cancel_event = Event()
+        results = Queue()
+        puzzle = grid_to_line(self.grid)
+        processes = [Process(target=_run_portfolio_solver, daemon=True,
+                             args=(type(self.game), puzzle, solver_type, self.trace, self.propagation,
+                                   self.budget.time_limit, self.budget.max_nodes, cancel_event, results))
+                     for solver_type in self.solver_types]
+        for process in processes:
+            process.start()
+
+        stop_reasons = []
+        reports = 0
+        has_no_solution = False
+        while reports < len(processes) and self.winner is None and not has_no_solution:
+            try:
+                solver_type, is_solved, grid, actions, stop_reason, nodes, has_no_solution = \
+                    results.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                if self.budget.token is not None and self.budget.token.is_cancelled():
+                    cancel_event.set()  # the solvers stop and report what they reached
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break  # a solver died without reporting
+                continue
 
+            reports += 1
+            self.budget.nodes += nodes
+            if is_solved and self.is_verified(grid):
+                self.winner = solver_type
+                self.grid = grid
+                self.actions_queue = actions
+                self.is_solved = True
+            else:
+                stop_reasons.append(stop_reason)
+                if np.count_nonzero(grid != EMPTY_VALUE) > self.best_progress:
+                    self.best_progress = np.count_nonzero(grid != EMPTY_VALUE)
+                    self.best_grid = grid
+
+        cancel_event.set()
+        for process in processes:
+            process.join(self.JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+
+        if not self.is_solved and stop_reasons and all(stop_reasons):
+            self.budget.stop(CANCELLED if CANCELLED in stop_reasons else stop_reasons[0])
+        return self.actions_queue
 
+    def is_verified(self, grid):
+        """whether grid solves this solver's puzzle"""
+        return bool(self.game.is_complete(grid) and np.all((self.grid == EMPTY_VALUE) | (grid == self.grid)))
@@ -0,0 +1,105 @@
+from benchmark import percentile, TOLERANCE
+import subprocess
+import json
+import sys
+import os
+
+# the modules a headless run starts from, and the modules they must not import (only the display needs them)
+MODULES = ('solvers', 'sudoku', 'game', 'batch', 'farm', 'benchmark', 'generator')
+DISPLAY_MODULES = ('pygame', 'board')
+
+
+def measure_import(module):
+    """
+    imports module in a fresh interpreter, returns the cumulative import time of the module in microseconds (from
+    python -X importtime) and the display modules it imported
+    """
+    code = "import sys, " + module + "; print(' '.join(name for name in " + repr(DISPLAY_MODULES) + \
+           " if name in sys.modules))"
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    cumulative = None
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package, the top level imports are not indented
+        if line.startswith('import time:') and line.split('|')[2].rstrip() == ' ' + module:
+            cumulative = int(line.split('|')[1])
+    return cumulative, process.stdout.splitlines()[-1].split()  # pygame prints a banner before
+
+
+def startup_benchmark(modules, runs):
+    """returns a row for every module: the median and p95 of its import time over runs fresh interpreters"""
+    results = []
+    for module in modules:
+        times = []
+        display_modules = set()
+        for _ in range(runs):
+            cumulative, imported = measure_import(module)
+            times.append(cumulative / 1000)
+            display_modules.update(imported)
+        times.sort()
+        results.append({'module': module,
+                        'runs': runs,
+                        'median_ms': round(percentile(times, 50), 3),
+                        'p95_ms': round(percentile(times, 95), 3),
+                        'display_modules': sorted(display_modules)})
+        print(module, "median:", results[-1]['median_ms'], "ms", ' '.join(display_modules), file=sys.stderr,
+              flush=True)
+    return results
+
+
+def compare_to_baseline(results, baseline):
+    """
+    returns a line for every module that imports a display module, or whose median import time is more than
+    TOLERANCE slower than the baseline's
+    """
+    baseline_rows = {row['module']: row for row in baseline}
+    regressions = []
+    for row in results:
+        if row['display_modules']:
+            regressions.append(row['module'] + " imports " + ", ".join(row['display_modules']))
+        base = baseline_rows.get(row['module'])
+        if base is not None and row['median_ms'] > base['median_ms'] * (1 + TOLERANCE):
+            regressions.append(row['module'] + ": median " + str(base['median_ms']) + " -> " +
+                               str(row['median_ms']) + " ms")
+    return regressions
+
+
+def print_explanation_and_terminate():
+    print("USAGE: <runs> [baseline-path.json] [module...]")
+    print("measures how long importing the solver core takes (python -X importtime, each run in a fresh interpreter) "
+          "for " + ", ".join(MODULES) + " (or the given modules), and checks that none of them imports " +
+          " or ".join(DISPLAY_MODULES))
+    print("if the baseline exists the results are compared to it and the regressions are reported (exit code 1), "
+          "otherwise the results are saved as the baseline")
+    print("example: 20 startup_baseline.json sudoku batch")
+    exit(-1)
+
+
+if __name__ == '__main__':
+    args = sys.argv
+    try:
+        runs = int(args[1])
+    except (IndexError, ValueError):
+        print_explanation_and_terminate()
+    baseline_path = args[2] if len(args) > 2 and args[2].endswith('.json') else None
+    modules = args[3 if baseline_path else 2:] or MODULES
+    if runs < 1:
+        print_explanation_and_terminate()
+
+    results = startup_benchmark(modules, runs)
+    json.dump(results, sys.stdout, indent=1)
+    print()
+
+    regressions = compare_to_baseline(results, [])
+    if baseline_path is not None:
+        if not os.path.exists(baseline_path):
+            with open(baseline_path, 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=1)
+            print("saved the baseline to", baseline_path, file=sys.stderr)
+        else:
+            with open(baseline_path) as baseline_file:
+                regressions = compare_to_baseline(results, json.load(baseline_file))
+    for regression in regressions:
+        print("REGRESSION:", regression, file=sys.stderr)
+    if regressions:
+        exit(1)
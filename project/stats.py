@@ -0,0 +1,55 @@
+import time
+
+
+class SolverStats:
+    """
+    Counters of a single solve, kept up to date by the solver:
+    nodes (from the solver's budget, see budget.py), insertions and deletions, backtracks (dead ends of the search),
+    get_legal_values and get_legal_values_count calls, prunings (values removed by propagation or arc consistency) and
+    the maximum search depth.
+    With the solver's profile_phases, the time and the calls of each of its phases (like domains_reduction) too.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.insertions = 0
+        self.deletions = 0
+        self.backtracks = 0
+        self.legal_values_calls = 0
+        self.prunings = 0
+        self.max_depth = 0
+        self.phase_times = {}  # phase -> seconds
+        self.phase_calls = {}  # phase -> number of calls
+
+    @property
+    def nodes(self):
+        return self.budget.nodes
+
+    def timed(self, phase, function):
+        """function, adding the time of every call to phase"""
+        self.phase_times.setdefault(phase, 0)
+        self.phase_calls.setdefault(phase, 0)
+
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.phase_times[phase] += time.perf_counter() - start
+                self.phase_calls[phase] += 1
+
+        return timed_function
+
+    def get_summary(self):
+        """the counters as a dict, phase times in seconds"""
+        summary = {'nodes': self.nodes,
+                   'insertions': self.insertions,
+                   'deletions': self.deletions,
+                   'backtracks': self.backtracks,
+                   'legal_values_calls': self.legal_values_calls,
+                   'prunings': self.prunings,
+                   'max_depth': self.max_depth}
+        for phase in self.phase_times:
+            summary[phase + '_time'] = round(self.phase_times[phase], 6)
+            summary[phase + '_calls'] = self.phase_calls[phase]
+        return summary
@@ -1,10 +1,11 @@
-from board import Board
 from functools import reduce
 import numpy as np
 
-from util import EMPTY_VALUE, Action, grid_to_string
+from util import EMPTY_VALUE, Geometry, grid_to_string, get_block_size, line_to_values
+from budget import Budget
 import time
-from solvers import BackTrackingSolver, CSPSolver, SimulatedAnnealingSolver, ArcConsistencySolver, ForwardCheckingSolver
+from solvers import BackTrackingSolver, CSPSolver, SimulatedAnnealingSolver, ArcConsistencySolver, \
+    ForwardCheckingSolver, DancingLinksSolver, MultiChainSimulatedAnnealingSolver, PortfolioSolver
 
 
 class SolverType:
@@ -13,29 +14,57 @@ class SolverType:
     SIMULATED_ANNEALING = 'Simulated Annealing'
     ARC_CONSISTENCY = 'Arc-Consistency'
     FORWARD_CHECKING = 'Forward Checking'
+    DANCING_LINKS = 'Dancing Links'
+    MULTI_CHAIN_SIMULATED_ANNEALING = 'Multi-Chain Simulated Annealing'
+    PORTFOLIO = 'Portfolio'
 
 
 class Sudoku:
-    BLOCK_INDEXES = [(0, 0), (0, 3), (0, 6), (3, 0), (3, 3), (3, 6), (6, 0), (6, 3), (6, 6)]
+    # the fastest solver varies a lot by puzzle, the portfolio races these
+    PORTFOLIO_SOLVER_TYPES = (SolverType.CSP, SolverType.ARC_CONSISTENCY, SolverType.SIMULATED_ANNEALING)
 
-    def __init__(self, filename, solver_type ='backtracking', display_enabled = False, print = False):
+    def __init__(self, filename, solver_type ='backtracking', display_enabled = False, print = False, puzzle = None,
+                 trace = True, propagation = False, budget = None, cache = None, playback_speed = None):
+        """
+        the puzzle is read from filename, unless given directly in puzzle, as a string (see parse_puzzle) or a grid
+        with trace=False the solver only counts its actions (the display needs them, so it always traces)
+        with propagation=True the solver runs the constraint propagation stage before and during its search
+        with a budget (see budget.py) the solver stops when its time or nodes run out or when it is cancelled
+        with a cache (see cache.py) puzzles isomorphic to one that was solved are not solved again
+        playback_speed is how many actions a second the display replays (see Board.replay for the default)
+        """
         self.__file_name = filename
-        self.__grid, self.__read_only_tiles = self.__parse_file(filename)
+        if puzzle is None:
+            self.__grid, self.__read_only_tiles = self.__parse_file(filename)
+        elif isinstance(puzzle, str):
+            self.__grid, self.__read_only_tiles = self.parse_puzzle(puzzle)
+        else:
+            self.__grid, self.__read_only_tiles = self.parse_grid(puzzle)
         self.__solver_type = solver_type
+        self.__cache = cache
+        trace = trace or display_enabled
 
         if solver_type == SolverType.BACKTRACKING:
-            self.__solver = BackTrackingSolver(self)
+            self.__solver = BackTrackingSolver(self, trace, propagation, budget)
         elif solver_type == SolverType.CSP:
-            self.__solver = CSPSolver(self)
+            self.__solver = CSPSolver(self, trace, propagation, budget)
         elif solver_type == SolverType.SIMULATED_ANNEALING:
-            self.__solver = SimulatedAnnealingSolver(self)
+            self.__solver = SimulatedAnnealingSolver(self, trace, propagation, budget)
         elif solver_type == SolverType.ARC_CONSISTENCY:
-            self.__solver = ArcConsistencySolver(self)
+            self.__solver = ArcConsistencySolver(self, trace, propagation, budget)
         elif solver_type == SolverType.FORWARD_CHECKING:
-            self.__solver = ForwardCheckingSolver(self)
+            self.__solver = ForwardCheckingSolver(self, trace, propagation, budget)
+        elif solver_type == SolverType.DANCING_LINKS:
+            self.__solver = DancingLinksSolver(self, trace, propagation, budget)
+        elif solver_type == SolverType.MULTI_CHAIN_SIMULATED_ANNEALING:
+            self.__solver = MultiChainSimulatedAnnealingSolver(self, trace, propagation, budget)
+        elif solver_type == SolverType.PORTFOLIO:
+            self.__solver = PortfolioSolver(self, trace, propagation, budget, self.PORTFOLIO_SOLVER_TYPES)
         self.__print_enabled = print
         self.__display_enabled = display_enabled
+        self.__playback_speed = playback_speed
         if display_enabled:
+            from board import Board  # pygame is only imported for the display, headless runs don't need it
             self.__board = Board(self.__grid)
 
     def play(self):
@@ -45,7 +74,10 @@ class Sudoku:
             print((grid_to_string(self.__grid)))
 
         start = time.time()
-        actions_queue = self.__solver.solve()
+        if self.__cache is not None:
+            actions_queue = self.__cache.solve(self.__solver)
+        else:
+            actions_queue = self.__solver.solve()
         end = time.time()
 
         total = end - start
@@ -58,23 +90,20 @@ class Sudoku:
                 print(self.__solver_type, "could not find solution. quit after",
                       round(total, 3), "seconds and", action_counter, "actions")
 
+            if self.__solver.get_stop_reason() is not None:
+                print(self.__solver_type, "stopped on its", self.__solver.get_stop_reason(), "after",
+                      self.__solver.budget.nodes, "nodes")
+                if self.__print_enabled:
+                    print("best grid it reached:")
+                    print(grid_to_string(self.__solver.get_best_grid()))
+
             return total, action_counter, False
 
         print(self.__solver_type, "got solution after", round(total, 3), "seconds and",
               str(len(actions_queue)), "actions", flush=True)
 
         if self.__display_enabled:
-            action_counter = 0
-
-            while actions_queue:
-                action = actions_queue.popleft()
-                if action.id == Action.INSERT:
-                    self.__insert(action.x, action.y, action.value)
-                elif action.id == Action.DELETE:
-                    self.__delete(action.x, action.y)
-
-                action_counter += 1
-
+            action_counter = self.__board.replay(actions_queue, self.__playback_speed)
             time.sleep(10)
         else:
             action_counter = len(actions_queue)
@@ -84,21 +113,20 @@ class Sudoku:
 
         return total, action_counter, True
 
-    def __insert(self, x, y, value):
+    def count_solutions(self, limit=2):
         """
-        puts value in the grid at tile (x,y)
+        the number of solutions of the puzzle up to limit, limit meaning limit or more (see Solver.count_solutions).
+        a fresh solver of the same type counts them from the read only tiles, with a fresh budget of the same limits:
+        this game's solver may have solved (or counted) already, and it doesn't start over. the solvers that can't
+        count (the local searches and the portfolio) leave it to dancing links
         """
-        self.__grid[y][x] = value
-        if self.__display_enabled:
-            self.__board.insert(y, x, value)
-
-    def __delete(self, x, y):
-        """
-        deletes the value in the grid at tile (x,y)
-        """
-        self.__grid[y][x] = EMPTY_VALUE
-        if self.__display_enabled:
-            self.__board.insert(y, x, EMPTY_VALUE)
+        puzzle = np.where(np.reshape(self.__read_only_tiles, self.__grid.shape), self.__grid, EMPTY_VALUE)
+        budget = self.__solver.budget
+        solver_type = self.__solver_type if self.__solver.COUNTS_SOLUTIONS else SolverType.DANCING_LINKS
+        counter = Sudoku(None, solver_type, puzzle=puzzle, trace=False,
+                         propagation=self.__solver.propagator is not None,
+                         budget=Budget(budget.time_limit, budget.max_nodes, budget.token))
+        return counter.get_solver().count_solutions(limit)
 
     @staticmethod
     def get_row(grid, y):
@@ -119,36 +147,25 @@ class Sudoku:
     @staticmethod
     def get_block(grid, x, y):
         """
-        returns a list representing the 3x3 block of tile (x,y) in the grid
+        returns a list representing the block of tile (x,y) in the grid (3x3 in a 9x9 grid)
         """
-        if 0 <= x < 3:
-            s_x = slice(0, 3)
-        elif 3 <= x < 6:
-            s_x = slice(3, 6)
-        else:
-            s_x = slice(6, 9)
-
-        if 0 <= y < 3:
-            s_y = slice(0, 3)
-        elif 3 <= y < 6:
-            s_y = slice(3, 6)
-        else:
-            s_y = slice(6, 9)
-
-        block = grid[s_y, s_x].reshape(9)
+        block_size = get_block_size(len(grid))
+        x_start, y_start = Sudoku.get_block_start_indexes(x, y, block_size)
+        block = grid[y_start:y_start + block_size, x_start:x_start + block_size].reshape(-1)
         return np.delete(block, np.where(block == EMPTY_VALUE))
 
     @staticmethod
     def get_first_empty_cell(grid, read_only, y_start = 0):
+        size = len(grid)
 
-        for y in range(y_start, 9):
-            for x in range(0, 9):
-                if grid[y][x] == EMPTY_VALUE and (x, y) not in read_only:
+        for y in range(y_start, size):
+            for x in range(0, size):
+                if grid[y][x] == EMPTY_VALUE and not read_only[y * size + x]:
                     return x, y
 
-        for y in range(0, 9):
-            for x in range(0, 9):
-                if grid[y][x] == EMPTY_VALUE and (x, y) not in read_only:
+        for y in range(0, size):
+            for x in range(0, size):
+                if grid[y][x] == EMPTY_VALUE and not read_only[y * size + x]:
                     return x, y
 
         return -1, -1
@@ -158,7 +175,7 @@ class Sudoku:
         """
         gets all possible legal values in the grid at tile (x,y)
         """
-        all_values = [i for i in range(1, 10)]
+        all_values = [i for i in range(1, len(grid) + 1)]
 
         row_values = Sudoku.get_row(grid, y)
         col_values = Sudoku.get_column(grid, x)
@@ -168,68 +185,32 @@ class Sudoku:
         return np.setdiff1d(all_values, curr_values)
 
     @staticmethod
-    def get_neighbors(x, y):
+    def get_neighbors(x, y, block_size):
         '''
         :param x:
         :param y:
-        :return: list of indexes of neighbors of (x,y)
+        :param block_size: 3 for a 9x9 grid, 4 for 16x16...
+        :return: tuple of indexes of neighbors of (x,y) (row, col and block), without (x,y) and without duplicates
         '''
-        row = [(j, y) for j in range(0, 9)]
-        col = [(x, i) for i in range(0, 9)]
-
-        if 0 <= x < 3:
-            s_x = range(0, 3)
-        elif 3 <= x < 6:
-            s_x = range(3, 6)
-        else:
-            s_x = range(6, 9)
-
-        if 0 <= y < 3:
-            s_y = range(0, 3)
-        elif 3 <= y < 6:
-            s_y = range(3, 6)
-        else:
-            s_y = range(6, 9)
-        block = []
-        for i in s_x:
-            for j in s_y:
-                block.append((i, j))
-
-        return row + col + block
+        return Geometry.get(block_size).peers[y][x]
 
     @staticmethod
     def is_complete(grid):
-        if np.any(grid == EMPTY_VALUE):
-            return False
-
-        # check rows
-        for i in range(9):
-            if len(set(Sudoku.get_row(grid, i))) != 9:
-                return False
-
-        # check columns
-        for i in range(9):
-            if len(set(Sudoku.get_column(grid, i))) != 9:
-                return False
-
-        # check blocks
-        block_indices = [(0, 0), (0, 3), (0, 6), (3, 0), (3, 3), (3, 6), (6, 0), (6, 3), (6, 6)]
-        for y, x in block_indices:
-            if len(set(Sudoku.get_block(grid, x, y))) != 9:
-                return False
-
-        return True
+        """whether every row, column and block of the grid holds exactly the values 1..size"""
+        grid = np.asarray(grid)
+        units = grid.reshape(-1)[np.array(Geometry.of_grid(grid).units_indexes)]
+        return bool(np.all(np.sort(units, axis=1) == np.arange(1, len(grid) + 1)))
 
     @staticmethod
-    def get_block_start_indexes(x, y):
-        return x // 3 * 3, y // 3 * 3
+    def get_block_start_indexes(x, y, block_size):
+        return x // block_size * block_size, y // block_size * block_size
 
     @staticmethod
-    def get_block_indexes(x,y):
+    def get_block_indexes(x, y, block_size):
         indexes = []
-        x_start, y_start = Sudoku.get_block_start_indexes(x, y)
-        for y_offset in range(3):
-            for x_offset in range(3):
+        x_start, y_start = Sudoku.get_block_start_indexes(x, y, block_size)
+        for y_offset in range(block_size):
+            for x_offset in range(block_size):
                 if x != x_start + x_offset or y != y_start + y_offset:
                     indexes += [(x_start + x_offset, y_start + y_offset)]
 
@@ -239,33 +220,41 @@ class Sudoku:
     def __parse_file(filename):
         with open(filename) as f:
             line = f.readlines()[0]
-        values = []
-        read_only = []
-        for index, char in enumerate(line):
-            if char == '-':
-                char = EMPTY_VALUE
-            else:
-                col = index % 9
-                row = int(index / 9)
-                read_only += [(col,row)]
-            values += [int(char)]
-
-        return np.array(values).reshape(9,9), read_only
+        return Sudoku.parse_puzzle(line)
 
     @staticmethod
-    def get_neighbors_indexes(x, y):
-        neighbors = []
-        for i in range(9):  # row and col
-            if i != y:
-                neighbors.append((x, i))
-            if i != x:
-                neighbors.append((i, y))
+    def parse_puzzle(line):
+        """
+        parses a puzzle of one character per tile, row by row: 81 characters for a 9x9 grid, 256 for 16x16...
+        values above 9 are letters (A is 10). empty tiles are '-' ('.' and '0' are accepted too)
+        returns the grid and the read only mask: a tuple of booleans, True at index y * size + x if (x,y) is read only
+        """
+        line = line.strip()
+        size = get_block_size(int(round(len(line) ** 0.5))) ** 2
+        if size * size != len(line):
+            raise ValueError("a puzzle of " + str(len(line)) + " characters is not a square grid")
 
-        # block
-        for neighbor in Sudoku.get_block_indexes(x, y):
-            neighbors.append(tuple(neighbor))
+        return Sudoku.parse_grid(line_to_values(line).reshape(size, size))
 
-        return neighbors
+    @staticmethod
+    def parse_grid(grid):
+        """
+        the grid (any size x size array, like a view of a corpus, see corpus.py) as a grid of ints of its own and
+        its read only mask. raises ValueError if it is not a grid of 4x4 or more, or if a value is above size
+        """
+        grid = np.array(grid, dtype=int)
+        if grid.ndim != 2 or len(grid) != grid.shape[1]:
+            raise ValueError("a puzzle of shape " + str(grid.shape) + " is not a square grid")
+        if get_block_size(len(grid)) < 2:
+            raise ValueError("a puzzle of " + str(len(grid)) + "x" + str(len(grid)) + " is not a sudoku grid")
+        if np.any((grid < EMPTY_VALUE) | (grid > len(grid))):
+            raise ValueError("the values of a " + str(len(grid)) + "x" + str(len(grid)) + " puzzle are 1 to " +
+                             str(len(grid)))
+        return grid, tuple((grid.reshape(-1) != EMPTY_VALUE).tolist())
+
+    @staticmethod
+    def get_neighbors_indexes(x, y, block_size):
+        return Geometry.get(block_size).peers[y][x]
 
     def get_grid(self):
         return self.__grid
@@ -273,6 +262,12 @@ class Sudoku:
     def get_read_only(self):
         return self.__read_only_tiles
 
+    def get_geometry(self):
+        return Geometry.of_grid(self.__grid)
+
+    def get_solver(self):
+        return self.__solver
+
     def set_grid(self, grid):
         self.__grid = grid.copy()
 
@@ -1,6 +1,9 @@
 import numpy as np
+from array import array
 
 EMPTY_VALUE = 0
+EMPTY_CHARS = '-.0'
+VALUE_CHARS = '123456789ABCDEFGHIJKLMNOP'  # up to 25x25 grids
 delay = 0.05
 
 solved_example = np.array([[7, 3, 5, 6, 1, 4, 8, 9, 2],
@@ -13,20 +16,52 @@ solved_example = np.array([[7, 3, 5, 6, 1, 4, 8, 9, 2],
                    [6, 9, 4, 7, 3, 8, 2, 1, 5],
                    [3, 2, 8, 5, 6, 1, 7, 4, 9], ])
 
+INVALID_CHAR_VALUE = 255
+CHAR_VALUES = np.full(256, INVALID_CHAR_VALUE, dtype=np.uint8)  # ascii code -> the value of the tile
+for char_value, char in enumerate(VALUE_CHARS, 1):
+    CHAR_VALUES[ord(char)] = CHAR_VALUES[ord(char.lower())] = char_value
+for char in EMPTY_CHARS:
+    CHAR_VALUES[ord(char)] = EMPTY_VALUE
+
+
+def value_to_char(value):
+    """values above 9 are written as letters (A is 10), empty tiles as '-'"""
+    return VALUE_CHARS[value - 1] if value != EMPTY_VALUE else '-'
+
+
+def line_to_values(line):
+    """
+    the values of a puzzle line (see Sudoku.parse_puzzle) as a flat uint8 array, looked up all at once
+    """
+    values = CHAR_VALUES[np.frombuffer(line.encode('ascii'), dtype=np.uint8)]
+    if np.any(values == INVALID_CHAR_VALUE):
+        raise ValueError("not a puzzle character in " + line)
+    return values
+
+
 def grid_to_string(grid):
+    block_size = get_block_size(len(grid))
+    separator = ' + '.join([' '.join('-' * block_size)] * block_size) + '\n'
     string = ""
-    for i in range(9):
-        if i in [3, 6]:
-            string += '- - - + - - - + - - -\n'
-        for j in range(9):
-            if j in [3, 6]:
+    for i in range(len(grid)):
+        if i and i % block_size == 0:
+            string += separator
+        for j in range(len(grid)):
+            if j and j % block_size == 0:
                 string += '| '
-            string += str(grid[i][j]) + " "
+            string += (str(grid[i][j]) if grid[i][j] <= 9 else value_to_char(grid[i][j])) + " "
         string += "\n"
 
     return string
 
 
+def grid_to_line(grid):
+    """
+    the grid as a line of one character per tile, row by row, with '-' for empty tiles (the puzzles file format)
+    """
+    return ''.join(value_to_char(value) for value in grid.reshape(-1))
+
+
 class Action:
     INSERT = 1
     DELETE = 2
@@ -42,4 +77,105 @@ class Action:
         self.x = x
         self.y = y
         self.value = value
-        self.actions_count = 0
\ No newline at end of file
+
+
+class ActionsTrace:
+    """
+    The log of the actions of a solver, in order.
+    Every action is packed to a single int in an array (5 bits for x, y and value, and the action id above them)
+    and only turned to an Action when read, with popleft() or by iterating, like a deque of Actions.
+    With record=False the actions are only counted, for benchmarking.
+    """
+    BITS = 5
+    MASK = (1 << BITS) - 1
+
+    def __init__(self, record=True):
+        self.__record = record
+        self.__packed = array('I')
+        self.__count = 0
+        self.__read = 0  # actions already taken out with popleft
+
+    def record_insert(self, x, y, value):
+        self.__count += 1
+        if self.__record:
+            self.__packed.append((((Action.INSERT << self.BITS | int(value)) << self.BITS) | y) << self.BITS | x)
+
+    def record_delete(self, x, y):
+        self.__count += 1
+        if self.__record:
+            self.__packed.append((((Action.DELETE << self.BITS) << self.BITS) | y) << self.BITS | x)
+
+    def is_recorded(self):
+        return self.__record
+
+    def __unpack(self, packed):
+        action = Action(packed & self.MASK, packed >> self.BITS & self.MASK, packed >> 2 * self.BITS & self.MASK)
+        action.id = packed >> 3 * self.BITS
+        return action
+
+    def popleft(self):
+        if self.__read >= len(self.__packed):
+            raise IndexError("pop from an empty actions trace")
+        self.__read += 1
+        return self.__unpack(self.__packed[self.__read - 1])
+
+    def __iter__(self):
+        for index in range(self.__read, len(self.__packed)):
+            yield self.__unpack(self.__packed[index])
+
+    def __len__(self):
+        return self.__count - self.__read
+
+
+
+class Geometry:
+    """
+    The tiles, units and peers of a size x size grid (size = block_size ** 2), computed once per block size.
+    Tiles are (x, y) tuples, the index of tile (x, y) is y * size + x.
+    Units are the rows, then the columns, then the blocks (row by row).
+    """
+    __geometries = {}
+
+    def __init__(self, block_size):
+        n = self.block_size = block_size
+        size = self.size = block_size * block_size
+        self.tiles_count = size * size
+        self.tiles = tuple((x, y) for y in range(size) for x in range(size))
+        self.rows = tuple(tuple((x, y) for x in range(size)) for y in range(size))
+        self.columns = tuple(tuple((x, y) for y in range(size)) for x in range(size))
+        self.blocks = tuple(tuple((x, y) for y in range(s_y, s_y + n) for x in range(s_x, s_x + n))
+                            for s_y in range(0, size, n) for s_x in range(0, size, n))
+        self.units = self.rows + self.columns + self.blocks
+
+        # tile_units[y][x] is the row, column and block of tile (x, y)
+        self.tile_units = tuple(tuple((self.rows[y], self.columns[x], self.blocks[self.get_block_index(x, y)])
+                                      for x in range(size)) for y in range(size))
+
+        # peers[y][x] are the tiles sharing a row, column or block with tile (x, y), without (x, y) and no duplicates
+        self.peers = tuple(tuple(tuple(sorted(set(sum(self.tile_units[y][x], ())) - {(x, y)},
+                                              key=lambda tile: tile[1] * size + tile[0]))
+                                 for x in range(size)) for y in range(size))
+        self.peers_indexes = tuple(tuple(x + size * y for x, y in self.peers[index // size][index % size])
+                                   for index in range(self.tiles_count))
+        self.units_indexes = tuple(tuple(x + size * y for x, y in unit) for unit in self.units)
+
+    def get_block_index(self, x, y):
+        return y // self.block_size * self.block_size + x // self.block_size
+
+    @staticmethod
+    def get(block_size=3):
+        if block_size not in Geometry.__geometries:
+            Geometry.__geometries[block_size] = Geometry(block_size)
+        return Geometry.__geometries[block_size]
+
+    @staticmethod
+    def of_grid(grid):
+        return Geometry.get(get_block_size(len(grid)))
+
+
+def get_block_size(size):
+    """the block size of a size x size grid, size must be a square"""
+    block_size = int(round(size ** 0.5))
+    if block_size * block_size != size:
+        raise ValueError("grid size " + str(size) + " is not a square")
+    return block_size